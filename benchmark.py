@@ -0,0 +1,767 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from dataclasses import replace
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+import scraper
+from scraper import INPIPatentScraper, PARSER_BACKENDS, CACHE_DIR, PatentHit, PatentDetails, DetailedPatent
+
+
+def synthetic_search_page(page=1, total_pages=1, per_page=100, first_id=100000):
+    """
+    Build a search results page with the structure of PatenteServletController
+
+    Args:
+        page (int): Page number shown in the pagination text
+        total_pages (int): Total number of pages shown in the pagination text
+        per_page (int): Number of result rows
+        first_id (int): CodPedido of the first row of page 1
+
+    Returns:
+        str: HTML content of the page
+    """
+    rows = []
+    for i in range(per_page):
+        patent_id = first_id + (page - 1) * per_page + i
+        rows.append(
+            '<tr>'
+            '<td><font class="normal">&nbsp;</font></td>'
+            f'<td><font class="normal"><a href="/pePI/servlet/PatenteServletController?Action=detail&CodPedido={patent_id}'
+            f'&SearchParameter=PETROLEO%20BRASILEIRO%20%20%20%20%20%20%20%20%20%20%20%20&Resumo=&Titulo=">'
+            f'BR 10 2020 {patent_id:06d} 0</a></font></td>'
+            '<td><font class="normal">14/02/2020</font></td>'
+            f'<td><font class="normal"><b>PROCESSO DE CRAQUEAMENTO\n CATALITICO {patent_id}</b></font></td>'
+            '<td><font class="normal">C10G 11/18</font></td>'
+            '</tr>'
+        )
+    return (
+        '<html><head><title>Resultado da Pesquisa</title></head><body>'
+        f'<font class="normal">Mostrando página <b>{page}</b> de <b>{total_pages}</b></font>'
+        f'<table><tbody id="tituloContext">{"".join(rows)}</tbody></table>'
+        '<a href="/pePI/servlet/LoginController?action=logout">Finalizar Sessão</a>'
+        '</body></html>'
+    )
+
+
+def synthetic_detail_page(patent_id=100000, publications=20, petitions=10, update_date="06/05/2025"):
+    """
+    Build a patent detail page with the structure of PatenteServletController
+
+    Args:
+        patent_id (int): CodPedido of the patent
+        publications (int): Number of rows in the publications table
+        petitions (int): Number of rows in the petitions table
+        update_date (str): Date shown in "Dados atualizados até"
+
+    Returns:
+        str: HTML content of the page
+    """
+    def field(label, value):
+        return (f'<tr><td><font class="alerta">{label}</font></td>'
+                f'<td><font class="normal">{value}</font></td></tr>')
+
+    publication_rows = ''.join(
+        '<tr class="normal">'
+        f'<td><font class="normal">{2600 + i}</font></td>'
+        f'<td><font class="normal"><b>{(i % 28) + 1:02d}/03/2021</b></font></td>'
+        f'<td><font class="normal"><a href="javascript:void(0)">{(i % 9) + 1}.1</a></font></td>'
+        f'<td>{"<img src=/pePI/imagens/iconePdf.png>" if i % 2 else ""}</td><td></td>'
+        '<td><font class="normal">Complemento do despacho</font></td>'
+        '</tr>'
+        for i in range(publications)
+    )
+    petition_rows = ''.join(
+        '<tr class="normal">'
+        f'<td><font class="normal"><a href="javascript:void(0)">{200 + i}</a></font></td>'
+        '<td><img alt="Pagamento confirmado"></td>'
+        f'<td><font class="normal">87000{i:05d}</font></td>'
+        '<td><font class="normal">10/05/2021</font></td>'
+        '<td></td><td></td><td></td>'
+        '<td><font class="normal">ESCRITORIO DE PATENTES</font></td>'
+        '</tr>'
+        for i in range(petitions)
+    )
+    anuidade_cells = ''.join(
+        f'<td><font class="normal">{i}ª</font><a href="javascript:void(0)">'
+        f'<img alt="Anuidade {"Averbada" if i % 2 else "Pendente"}"></a></td>'
+        for i in range(3, 12)
+    )
+    return (
+        '<html><head><title>Detalhe do Pedido</title></head><body>'
+        f'<font class="marcador">BR 10 2020 {patent_id:06d} 0</font>'
+        '<table>'
+        + field('Data do Depósito:', '14/02/2020')
+        + field('Data da Publicação:', '24/08/2021')
+        + field('Data da Concessão:', '-')
+        + '<tr><td><font class="alerta">Classificação IPC:</font></td><td>'
+        '<a href="javascript:void(0)" class="normal" onmouseout="hideMe(\'classificacao0\')">C10G 11/18</a>'
+        '<a href="javascript:void(0)" class="normal" onmouseout="hideMe(\'classificacao1\')">B01J 29/08</a>'
+        '</td></tr>'
+        f'<tr><td><font class="alerta">Título:</font></td><td><div id="tituloContext"><font class="normal">'
+        f'PROCESSO DE CRAQUEAMENTO CATALITICO {patent_id}</font></div></td></tr>'
+        '<tr><td><font class="alerta">Resumo:</font></td><td><div id="resumoContext"><font class="normal">'
+        + 'A presente invenção refere-se a um processo de craqueamento catalítico. ' * 10
+        + '</font></div></td></tr>'
+        + field('Nome do Depositante:', 'PETROLEO BRASILEIRO S.A. - PETROBRAS (BR/RJ)')
+        + field('Nome do Inventor:', 'JOÃO DA SILVA / MARIA SOUZA / PEDRO SANTOS')
+        + field('Nome do Procurador:', 'ESCRITORIO DE PATENTES LTDA')
+        + '</table>'
+        '<div class="accordion-item"><input type="checkbox" id="accordion-1"><label>Petições</label>'
+        '<div class="accordion-content"><table>'
+        '<tr><td><font class="titulo">Serviços</font></td></tr>' + petition_rows
+        + '</table></div></div>'
+        '<div class="accordion-item"><input type="checkbox" id="accordion-2"><label>Anuidades</label>'
+        f'<div class="accordion-content"><table><tr>{anuidade_cells}</tr></table></div></div>'
+        '<div class="accordion-item"><input type="checkbox" id="accordion-3"><label>Publicações</label>'
+        f'<div class="accordion-content"><table>{publication_rows}</table></div></div>'
+        f'<font class="normal">Dados atualizados até <b>{update_date}</b> - Nº da Revista: <b>2835</b></font>'
+        '<a href="/pePI/servlet/LoginController?action=logout">Finalizar Sessão</a>'
+        '</body></html>'
+    )
+
+
+def recorded_pages(cache_dir, limit):
+    """
+    Load recorded search and detail pages from the scraper cache
+
+    Args:
+        cache_dir (str): Folder containing the cached pages
+        limit (int): Maximum number of pages of each type
+
+    Returns:
+        tuple: Lists of search page and detail page HTML contents
+    """
+    search_files, detail_files = scraper._list_cached_pages(cache_dir)
+
+    def read(paths):
+        contents = []
+        for path in paths[:limit]:
+            contents.append(scraper.read_cached_page(path))
+        return contents
+
+    return read(search_files), read(detail_files)
+
+
+def measure(func, repeat, setup=None):
+    """
+    Time a function
+
+    Args:
+        func (callable): Function to time
+        repeat (int): Number of timed runs
+        setup (callable, optional): Function called before each run, not timed
+
+    Returns:
+        list: Duration of each run in seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def result(name, timings, **params):
+    """
+    Summarize the timings of a benchmark
+
+    Args:
+        name (str): Name of the benchmark
+        timings (list): Duration of each run in seconds
+        **params: Parameters of the benchmark
+
+    Returns:
+        dict: Machine readable result
+    """
+    return {
+        'name': name,
+        'params': params,
+        'unit': 'seconds',
+        'repeat': len(timings),
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+    }
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the progress output of the scraper"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def offline_scraper(csv_file=None, state_file=None, parser_backend='html.parser'):
+    """Create a scraper that never loads browser cookies, reads the detail cache or paces its requests"""
+    with quiet():
+        return INPIPatentScraper(csv_file=csv_file, state_file=state_file, use_browser_cookies=False,
+                                 use_detail_cache=False, parser_backend=parser_backend, parse_memo_size=0,
+                                 requests_per_second=0)
+
+
+def multi_pass_parse_detail_page(parser, html_content):
+    """
+    Parse a detail page the way _parse_detail_page() did before the single
+    pass extractor: one document search per field, kept as the baseline of
+    the parser comparison
+
+    Args:
+        parser (INPIPatentScraper): Scraper providing the soup builder and the text cleanup
+        html_content (str): HTML content of the detail page
+
+    Returns:
+        dict: Dictionary containing the patent details
+    """
+    soup = parser._make_soup(html_content)
+
+    # Extract details from the detail page
+    details = {}
+
+    # Extract patent number (código de pedido BR XX XXXX XXXXXX X)
+    patent_number_elem = soup.select_one("font.marcador")
+    if patent_number_elem:
+        details['patent_number_full'] = parser._remove_line_breaks(patent_number_elem.text.strip())
+
+    # Extract filing date (data do depósito)
+    filing_date_row = soup.find("font", string=lambda text: text and "Data do Depósito:" in text)
+    if filing_date_row:
+        filing_date_elem = filing_date_row.find_next("font", class_="normal")
+        if filing_date_elem:
+            details['filing_date_detail'] = parser._remove_line_breaks(filing_date_elem.text.strip())
+
+    # Extract publication date if available
+    pub_date_row = soup.find("font", string=lambda text: text and "Data da Publicação:" in text)
+    if pub_date_row:
+        pub_date_elem = pub_date_row.find_next("font", class_="normal")
+        if pub_date_elem:
+            pub_date = pub_date_elem.text.strip().replace('-', '').strip()
+            details['publication_date'] = parser._remove_line_breaks(pub_date) if pub_date else None
+
+    # Extract grant date if available
+    grant_date_row = soup.find("font", string=lambda text: text and "Data da Concessão:" in text)
+    if grant_date_row:
+        grant_date_elem = grant_date_row.find_next("font", class_="normal")
+        if grant_date_elem:
+            grant_date = grant_date_elem.text.strip().replace('-', '').strip()
+            details['grant_date'] = parser._remove_line_breaks(grant_date) if grant_date else None
+
+    # Extract IPC classifications if available
+    ipc_rows = soup.find_all("a", href="javascript:void(0)", onmouseout=lambda x: x and "hideMe('classificacao" in x)
+    ipc_codes = []
+    for i, row in enumerate(ipc_rows):
+        if 'normal' in row.get('class', []) and row.text.strip():
+            ipc_codes.append(parser._remove_line_breaks(row.text.strip()))
+
+    if ipc_codes:
+        details['ipc_codes'] = ipc_codes
+
+    # Extract title
+    title_context = soup.select_one("div#tituloContext")
+    if title_context:
+        title_text = title_context.get_text(strip=True)
+        if title_text:
+            details['title'] = parser._remove_line_breaks(title_text)
+
+    # Extract abstract
+    abstract_context = soup.select_one("div#resumoContext")
+    if abstract_context:
+        abstract_text = abstract_context.get_text(strip=True)
+        if abstract_text:
+            details['abstract'] = parser._remove_line_breaks(abstract_text)
+
+    # Extract applicants (depositantes)
+    applicant_row = soup.find("font", string=lambda text: text and "Nome do Depositante:" in text)
+    if applicant_row:
+        applicant_elem = applicant_row.find_next("font", class_="normal")
+        if applicant_elem:
+            applicants_text = applicant_elem.text.strip()
+            details['applicants'] = [parser._remove_line_breaks(app.strip()) for app in applicants_text.split('/')]
+            details['applicants_raw'] = parser._remove_line_breaks(applicants_text)
+
+    # Extract inventors if available
+    inventor_row = soup.find("font", string=lambda text: text and "Nome do Inventor:" in text)
+    if inventor_row:
+        inventor_elem = inventor_row.find_next("font", class_="normal")
+        if inventor_elem:
+            inventors_text = inventor_elem.text.strip()
+            details['inventors'] = [parser._remove_line_breaks(inv.strip()) for inv in inventors_text.split('/')]
+            details['inventors_raw'] = parser._remove_line_breaks(inventors_text)
+
+    # Extract patent agent if available
+    agent_row = soup.find("font", string=lambda text: text and "Nome do Procurador:" in text)
+    if agent_row:
+        agent_elem = agent_row.find_next("font", class_="normal")
+        if agent_elem:
+            details['patent_agent'] = parser._remove_line_breaks(agent_elem.text.strip())
+
+    # Extract publications/despachos (office actions)
+    publications = []
+    pub_table = soup.select_one("div.accordion-item input#accordion-3 + label + div.accordion-content table")
+    if pub_table:
+        pub_rows = pub_table.select("tr.normal")
+        for row in pub_rows:
+            rpi_elem = row.select_one("td:nth-of-type(1) font.normal")
+            date_elem = row.select_one("td:nth-of-type(2) font.normal b")
+            code_elem = row.select_one("td:nth-of-type(3) font.normal a")
+            # Look for PDF icon
+            pdf_elem = row.select_one("td:nth-of-type(4) img[src*='iconePdf.png']")
+            complement_elem = row.select_one("td:nth-of-type(6) font.normal")
+
+            if rpi_elem and date_elem and code_elem:
+                pub = {
+                    'rpi': parser._remove_line_breaks(rpi_elem.text.strip()),
+                    'date': parser._remove_line_breaks(date_elem.text.strip()),
+                    'code': parser._remove_line_breaks(code_elem.text.strip()),
+                    'has_pdf': bool(pdf_elem),
+                    'complement': parser._remove_line_breaks(complement_elem.text.strip() if complement_elem else '')
+                }
+                publications.append(pub)
+
+    # Convert publications to JSON string for storage in single field
+    if publications:
+        details['publications_json'] = json.dumps(publications, ensure_ascii=False)
+
+    # Extract petitions (petições)
+    petitions = []
+    pet_table = soup.select_one("div.accordion-item input#accordion-1 + label + div.accordion-content table")
+    if pet_table:
+        petition_sections = pet_table.find_all("font", class_="titulo", string=lambda x: x and x.strip() in ["Serviços", "Anuidade", "Outros"])
+        for section in petition_sections:
+            section_tr = section.find_parent("tr")
+
+            # Get all petition rows after this section heading and before the next section
+            petition_rows = []
+            current = section_tr.find_next_sibling("tr")
+            while current and not current.find("font", class_="titulo"):
+                if 'normal' in current.get('class', []):
+                    petition_rows.append(current)
+                current = current.find_next_sibling("tr")
+
+            for row in petition_rows:
+                service_elem = row.select_one("td:nth-of-type(1) font.normal a")
+                payment_elem = row.select_one("td:nth-of-type(2) img[alt*='Pagamento']")
+                protocol_elem = row.select_one("td:nth-of-type(3) font.normal")
+                date_elem = row.select_one("td:nth-of-type(4) font.normal")
+                client_elem = row.select_one("td:nth-of-type(8) font.normal")
+
+                if service_elem and protocol_elem and date_elem:
+                    service_code = service_elem.text.strip()
+                    petition = {
+                        'section': parser._remove_line_breaks(section.text.strip()),
+                        'service_code': parser._remove_line_breaks(service_code),
+                        'has_payment': bool(payment_elem),
+                        'protocol': parser._remove_line_breaks(protocol_elem.text.strip()),
+                        'date': parser._remove_line_breaks(date_elem.text.strip()),
+                        'client': parser._remove_line_breaks(client_elem.text.strip() if client_elem else '')
+                    }
+                    petitions.append(petition)
+
+    # Convert petitions to JSON string for storage in single field
+    if petitions:
+        details['petitions_json'] = json.dumps(petitions, ensure_ascii=False)
+
+    # Extract anuidades (fees)
+    anuidades = {}
+    anuidade_table = soup.select_one("div.accordion-item input#accordion-2 + label + div.accordion-content table")
+    if anuidade_table:
+        # Get the status of anuidades (fees) using the images
+        anuidade_imgs = anuidade_table.select("a[href*='javascript:void(0)'] img[alt*='Anuidade']")
+        for img in anuidade_imgs:
+            if img.find_previous("font", class_="normal"):
+                anuidade_num = img.find_previous("font", class_="normal").text.strip()
+                anuidade_status = "Paga" if "Averbada" in img.get("alt", "") else "Não Paga"
+                anuidade_num = anuidade_num.split("ª")[0] if "ª" in anuidade_num else anuidade_num
+                anuidades[f"anuidade_{anuidade_num}"] = anuidade_status
+
+    if anuidades:
+        details['anuidades_json'] = json.dumps(anuidades, ensure_ascii=False)
+
+    # Extract last update date
+    # The date is in a <b> next to the label text, so match on the element holding the text
+    update_date_text = soup.find(string=lambda text: text and "Dados atualizados até" in text)
+    if update_date_text:
+        date_match = re.search(r'atualizados até\s*(?:<b>)?\s*(\d{2}/\d{2}/\d{4})', str(update_date_text.parent))
+        if date_match:
+            details['last_update_date'] = parser._remove_line_breaks(date_match.group(1))
+
+    return details
+
+
+def bench_parsing(repeat, search_pages, detail_pages, fixture):
+    """
+    Benchmark iter_patents() and _parse_detail_page() with every available parser backend,
+    and compare _parse_detail_page() with the previous multi-pass detail parser
+
+    Args:
+        repeat (int): Number of timed runs
+        search_pages (list): Search page HTML contents
+        detail_pages (list): Detail page HTML contents
+        fixture (str): Name of the fixture set, "synthetic" or "recorded"
+
+    Returns:
+        list: Benchmark results, timed per page
+    """
+    results = []
+    for backend in PARSER_BACKENDS:
+        parser = offline_scraper(parser_backend=backend)
+        if parser.parser_backend != backend:
+            continue
+
+        if search_pages:
+            def parse_search_pages():
+                for html_content in search_pages:
+                    list(parser.iter_patents(html_content))
+
+            timings = measure(parse_search_pages, repeat)
+            results.append(result('parse_page', [t / len(search_pages) for t in timings],
+                                  backend=backend, fixture=fixture, pages=len(search_pages)))
+
+        if detail_pages:
+            def parse_detail_pages():
+                for html_content in detail_pages:
+                    parser._parse_detail_page(html_content)
+
+            timings = measure(parse_detail_pages, repeat)
+            single_pass = result('parse_detail_page', [t / len(detail_pages) for t in timings],
+                                 backend=backend, fixture=fixture, pages=len(detail_pages))
+            results.append(single_pass)
+
+            # The previous multi-pass extractor on the same pages, and whether both agree
+            def parse_detail_pages_multi_pass():
+                for html_content in detail_pages:
+                    multi_pass_parse_detail_page(parser, html_content)
+
+            timings = measure(parse_detail_pages_multi_pass, repeat)
+            mismatches = 0
+            for html_content in detail_pages:
+                current = parser._parse_detail_page(html_content).to_dict()
+                previous = multi_pass_parse_detail_page(parser, html_content)
+                if any(current.get(key) != previous.get(key) for key in set(current) | set(previous)):
+                    mismatches += 1
+            multi_pass = result('parse_detail_page_multi_pass', [t / len(detail_pages) for t in timings],
+                                backend=backend, fixture=fixture, pages=len(detail_pages), mismatches=mismatches)
+            multi_pass['speedup'] = multi_pass['median'] / single_pass['median']
+            results.append(multi_pass)
+    return results
+
+
+def detailed_records(count, first_id=100000):
+    """
+    Build detailed patent records like the ones fetch_all_details() produces
+
+    Args:
+        count (int): Number of records
+        first_id (int): patent_id of the first record
+
+    Returns:
+        list: List of DetailedPatent records
+    """
+    parser = offline_scraper()
+    patent = next(parser.iter_patents(synthetic_search_page(per_page=1, first_id=first_id)))
+    details = parser._parse_detail_page(synthetic_detail_page(first_id))
+
+    return [parser._merge_details(replace(patent, patent_id=str(first_id + i),
+                                          patent_number=f"BR 10 2020 {first_id + i:06d} 0"), details)
+            for i in range(count)]
+
+
+def bench_persistence(repeat, sizes, workdir):
+    """
+    Benchmark load_existing_data() startup and an append_to_csv() flush of 10 rows
+    into output files of several sizes
+
+    Args:
+        repeat (int): Number of timed runs
+        sizes (list): Number of rows already in the output file
+        workdir (str): Folder for the temporary files
+
+    Returns:
+        list: Benchmark results
+    """
+    results = []
+    template = detailed_records(1)[0]
+    template_row = template.to_dict()
+    for size in sizes:
+        csv_file = os.path.join(workdir, f"bench_{size}.csv")
+        state_file = os.path.join(workdir, f"bench_{size}.json")
+        existing = [dict(template_row, patent_id=str(i), patent_number=f"BR {i}") for i in range(size)]
+        pd.DataFrame(existing).to_csv(csv_file, index=False, encoding='utf-8')
+        del existing
+
+        writer = offline_scraper(csv_file=csv_file, state_file=state_file)
+
+        def load():
+            with quiet():
+                writer.load_existing_data(csv_file, state_file)
+
+        results.append(result('load_existing_data', measure(load, repeat), rows=size))
+
+        next_id = [size]
+
+        def queue_batch():
+            writer.detailed_patents = [DetailedPatent(replace(template.hit, patent_id=str(next_id[0] + i)),
+                                                      template.details) for i in range(10)]
+            next_id[0] += 10
+
+        def flush():
+            with quiet():
+                writer.append_to_csv()
+
+        results.append(result('append_to_csv', measure(flush, repeat, setup=queue_batch), rows=size, batch=10))
+    return results
+
+
+def bench_memory(count):
+    """
+    Measure the peak memory of holding the search hits and detailed patents of
+    a run, as the per-row dictionaries used before PatentHit/DetailedPatent and
+    as the slotted records
+
+    Args:
+        count (int): Number of patents
+
+    Returns:
+        list: Benchmark results, with the peak traced memory in bytes
+    """
+    parser = offline_scraper()
+    hit = next(parser.iter_patents(synthetic_search_page(per_page=1))).to_dict()
+    details = parser._parse_detail_page(synthetic_detail_page()).to_dict()
+
+    def fresh(value):
+        # Every parsed page yields new string objects
+        if isinstance(value, str):
+            return value.encode('utf-8').decode('utf-8')
+        if isinstance(value, list):
+            return [fresh(item) for item in value]
+        return value
+
+    def as_dicts():
+        found_patents, patents, detailed_patents = {}, [], []
+        for i in range(count):
+            patent = {key: fresh(value) for key, value in hit.items()}
+            patent['patent_id'] = str(100000 + i)
+            found_patents[patent['patent_id']] = patent
+            patents.append(patent)
+            combined = patent.copy()
+            for key, value in details.items():
+                if key not in combined:
+                    combined[key] = fresh(value)
+            detailed_patents.append(combined)
+        return found_patents, patents, detailed_patents
+
+    def as_records():
+        found_patents, patents, detailed_patents = {}, [], []
+        for i in range(count):
+            patent = PatentHit(**{key: fresh(value) for key, value in hit.items()})
+            patent.patent_id = str(100000 + i)
+            found_patents[patent.patent_id] = patent
+            patents.append(patent)
+            detailed_patents.append(DetailedPatent(patent, PatentDetails(**{key: fresh(value)
+                                                                            for key, value in details.items()})))
+        return found_patents, patents, detailed_patents
+
+    results = []
+    for representation, build in (('dict', as_dicts), ('record', as_records)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        held = build()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del held
+
+        entry = result('records_memory', [elapsed], representation=representation, patents=count)
+        entry['peak_bytes'] = peak
+        results.append(entry)
+    return results
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves synthetic PatenteServletController pages for an end-to-end run"""
+
+    total_pages = 3
+    per_page = 100
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, html_content):
+        if self.latency:
+            time.sleep(self.latency)
+        body = html_content.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        action = params.get('Action', [''])[0]
+        if action == 'nextPage':
+            page = int(params.get('Page', ['1'])[0])
+            self._send(synthetic_search_page(page, self.total_pages, self.per_page))
+        elif action == 'detail':
+            self._send(synthetic_detail_page(int(params['CodPedido'][0])))
+        else:
+            # Authentication probe
+            self._send('<html><body><a href="#">Finalizar Sessão</a></body></html>')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        self._send(synthetic_search_page(1, self.total_pages, self.per_page))
+
+
+def bench_end_to_end(repeat, workdir, total_pages, per_page, workers, latency):
+    """
+    Benchmark a full search() + fetch_all_details() run against a local stand-in server
+
+    Args:
+        repeat (int): Number of timed runs
+        workdir (str): Folder for the output files and the page cache
+        total_pages (int): Number of result pages served
+        per_page (int): Number of results per page
+        workers (list): Worker counts to run; 1 uses fetch_all_details()
+        latency (float): Simulated server latency in seconds per request
+
+    Returns:
+        list: Benchmark results
+    """
+    StandInHandler.total_pages = total_pages
+    StandInHandler.per_page = per_page
+    StandInHandler.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}/pePI"
+
+    results = []
+    try:
+        for worker_count in workers:
+            run = [0]
+
+            def scrape():
+                run[0] += 1
+                prefix = os.path.join(workdir, f"e2e_{worker_count}_{run[0]}")
+                client = offline_scraper(csv_file=prefix + ".csv", state_file=prefix + ".json")
+                client.base_url = f"{base}/servlet/PatenteServletController"
+                client.auth_check_url = f"{base}/jsp/patentes/PatenteSearchBasico.jsp"
+                with quiet():
+                    client.is_authenticated()
+                    client.search("petroleo brasileiro", "NomeDepositante", continue_from_last=False)
+                    if worker_count > 1:
+                        client.fetch_all_details_concurrent(workers=worker_count)
+                    else:
+                        client.fetch_all_details(delay=False)
+                    client.append_to_csv()
+
+            timings = measure(scrape, repeat)
+            patents = total_pages * per_page
+            entry = result('end_to_end', timings, pages=total_pages, patents=patents,
+                           workers=worker_count, latency=latency)
+            entry['patents_per_second'] = patents / entry['median']
+            results.append(entry)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+def git_revision():
+    """Return the current git commit, or None outside a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="INPI Scraper benchmarks")
+    parser.add_argument("--output", default="benchmark_results.json", help="File the JSON results are written to")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs per benchmark")
+    parser.add_argument("--quick", action="store_true", help="Skip the 100k-row persistence benchmark and use a smaller end-to-end run")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Folder with recorded pages used as extra fixtures")
+    parser.add_argument("--recorded-limit", type=int, default=50, help="Maximum number of recorded pages of each type")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated server latency in seconds for the end-to-end run")
+    args = parser.parse_args()
+
+    cache_dir = os.path.abspath(args.cache_dir)
+    workdir = tempfile.mkdtemp(prefix="inpi_bench_")
+    original_dir = os.getcwd()
+    output_file = os.path.abspath(args.output)
+
+    results = []
+    try:
+        # The scraper writes its page cache relative to the working directory
+        os.chdir(workdir)
+
+        print("Benchmarking parsers on synthetic pages...")
+        results += bench_parsing(args.repeat, [synthetic_search_page()],
+                                 [synthetic_detail_page(100000 + i) for i in range(10)], 'synthetic')
+
+        recorded_search, recorded_detail = recorded_pages(cache_dir, args.recorded_limit)
+        if recorded_search or recorded_detail:
+            print(f"Benchmarking parsers on {len(recorded_search)} recorded search pages "
+                  f"and {len(recorded_detail)} recorded detail pages...")
+            results += bench_parsing(args.repeat, recorded_search, recorded_detail, 'recorded')
+
+        sizes = [1000, 10000] if args.quick else [1000, 10000, 100000]
+        print(f"Benchmarking persistence at {sizes} rows...")
+        results += bench_persistence(args.repeat, sizes, workdir)
+
+        count = 20000 if args.quick else 200000
+        print(f"Measuring the memory of {count} patent records...")
+        results += bench_memory(count)
+
+        print("Benchmarking end-to-end scrape against a local stand-in server...")
+        total_pages = 2 if args.quick else 5
+        results += bench_end_to_end(max(1, args.repeat // 2), workdir, total_pages, 100, [1, 4], args.latency)
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'pandas': pd.__version__,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print()
+    for entry in results:
+        params = ', '.join(f"{key}={value}" for key, value in entry['params'].items())
+        peak = f"  peak {entry['peak_bytes'] / 2 ** 20:8.1f} MiB" if 'peak_bytes' in entry else ''
+        speedup = f"  single pass {entry['speedup']:.2f}x faster" if 'speedup' in entry else ''
+        print(f"{entry['name']:<20} {params:<60} median {entry['median'] * 1000:10.2f} ms{peak}{speedup}")
+    print(f"\nWrote results to {output_file}")
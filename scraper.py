@@ -1,30 +1,1232 @@
 import argparse
 import browser_cookie3
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, NavigableString
 import pandas as pd
 import time
+import uuid
 import re
 import random
 import os
 import webbrowser
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
+import csv
 import hashlib
+import functools
+import cProfile
+import pstats
+import tracemalloc
+import heapq
 import sys
+import glob
+import sqlite3
+from collections import OrderedDict, deque
+import threading
+import queue
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from dataclasses import dataclass, fields, replace
 
 # add your cookie string here or use browser_cookie3
 COOKIES_STRING = ""
 
+# Folder where raw search and detail pages are saved
+CACHE_DIR = "inpi_cache"
+
+# BeautifulSoup tree builders that can parse the pages. html.parser is the
+# reference implementation; lxml builds the same tree several times faster
+PARSER_BACKENDS = ('html.parser', 'lxml')
+DEFAULT_PARSER_BACKEND = 'html.parser'
+
+# Advanced patent search form, used to restrict a search to a range of filing
+# dates. The query goes in the field named after the search column.
+ADVANCED_SEARCH_FORM = {
+    'Action': 'SearchAvancado',
+    'RegisterPerPage': '100',
+    'botao': ' pesquisar » ',
+}
+FILING_DATE_FIELDS = ('DataDeposito1', 'DataDeposito2')
+
+
+def _intern(value):
+    """Intern a string that repeats across many patents, such as a name, a date or an IPC code"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _intern_all(values):
+    """Intern every string of a list"""
+    return [_intern(value) for value in values] if values is not None else None
+
+
+@dataclass(slots=True)
+class PatentHit:
+    """A patent row of the search results"""
+    patent_number: str = None
+    filing_date: str = None
+    patent_id: str = None
+    title: str = None
+    ipc: str = None
+    patent_number_raw: str = None
+    search_param: str = ''
+    matched_queries: list = None
+
+    def __post_init__(self):
+        self.filing_date = _intern(self.filing_date)
+        self.ipc = _intern(self.ipc)
+        self.search_param = _intern(self.search_param)
+
+    def to_dict(self):
+        """Return the hit as stored in the search state and the output files"""
+        row = {field.name: getattr(self, field.name) for field in fields(self) if field.name != 'matched_queries'}
+        if self.matched_queries is not None:
+            row['matched_queries'] = self.matched_queries
+        return row
+
+    @classmethod
+    def from_dict(cls, row):
+        """Build a hit from a search state or database row"""
+        return cls(**{field.name: row[field.name] for field in fields(cls) if field.name in row})
+
+
+@dataclass(slots=True)
+class PatentDetails:
+    """The fields read from a patent detail page. Fields the page lacks are None."""
+    patent_number_full: str = None
+    filing_date_detail: str = None
+    publication_date: str = None
+    grant_date: str = None
+    ipc_codes: list = None
+    title: str = None
+    abstract: str = None
+    applicants: list = None
+    applicants_raw: str = None
+    inventors: list = None
+    inventors_raw: str = None
+    patent_agent: str = None
+    publications_json: str = None
+    petitions_json: str = None
+    anuidades_json: str = None
+    last_update_date: str = None
+    fetched_at: str = None  # When the page was downloaded, as YYYY-MM-DD HH:MM:SS
+    patent_id: str = None  # Only set on the partial result of a timed out request
+
+    def __post_init__(self):
+        self.filing_date_detail = _intern(self.filing_date_detail)
+        self.publication_date = _intern(self.publication_date)
+        self.grant_date = _intern(self.grant_date)
+        self.last_update_date = _intern(self.last_update_date)
+        self.patent_agent = _intern(self.patent_agent)
+        self.applicants = _intern_all(self.applicants)
+        self.inventors = _intern_all(self.inventors)
+        self.ipc_codes = _intern_all(self.ipc_codes)
+
+    def __bool__(self):
+        # Like the dictionary it replaces, a page that yielded no field is falsy
+        return any(getattr(self, field.name) is not None for field in fields(self))
+
+    def get(self, name, default=None):
+        """Return a field, or default if it is not set"""
+        value = getattr(self, name, None)
+        return default if value is None else value
+
+    def to_dict(self):
+        """Return every field, in the column order of the output files"""
+        return {field.name: getattr(self, field.name) for field in fields(self)}
+
+
+@dataclass(slots=True)
+class DetailedPatent:
+    """A search hit with the details fetched for it, referenced rather than copied"""
+    hit: PatentHit
+    details: PatentDetails
+
+    @property
+    def patent_id(self):
+        return self.hit.patent_id if self.hit is not None else self.details.patent_id
+
+    def to_dict(self):
+        """
+        Return the record as written to the output files. The search
+        results win over the detail page when both have a field.
+        """
+        row = self.hit.to_dict() if self.hit is not None else {'patent_id': self.details.patent_id}
+        for key, value in self.details.to_dict().items():
+            if key not in row:
+                row[key] = value
+        return row
+
+
+class AdaptiveRateLimiter:
+    """
+    Thread-safe token bucket shared by every request to the site. The rate
+    grows slowly while responses are fast and is cut in half on server
+    errors, timeouts and slow responses. A rate of 0 disables pacing.
+    """
+
+    def __init__(self, rate=1.0, min_rate=0.1, max_rate=2.0, target_latency=1.0, increase_step=0.05, burst=1):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.target_latency = target_latency
+        self.increase_step = increase_step
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'errors': 0,
+            'slow_responses': 0,
+            'retries': 0,
+            'total_latency': 0.0,
+        }
+
+    def acquire(self):
+        """Block until the caller is allowed to send its next request"""
+        with self.lock:
+            if not self.rate:
+                return
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Reserve a token; a negative balance is the time this caller has to wait
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+        if delay > 0:
+            time.sleep(delay)
+
+    def set_max_rate(self, max_rate):
+        """Change the highest rate the limiter may reach"""
+        with self.lock:
+            self.max_rate = max_rate
+            if self.rate:
+                self.rate = min(self.rate, max_rate)
+
+    def record_success(self, latency):
+        """
+        Adapt the rate to the latency of a successful response
+
+        Args:
+            latency (float): Response time in seconds
+        """
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['total_latency'] += latency
+            if not self.rate:
+                return
+            if latency > 2 * self.target_latency:
+                self.stats['slow_responses'] += 1
+                self.rate = max(self.min_rate, self.rate / 2)
+            elif latency < self.target_latency:
+                self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def record_failure(self):
+        """Back off after a server error or a timeout"""
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['errors'] += 1
+            if self.rate:
+                self.rate = max(self.min_rate, self.rate / 2)
+
+    def record_retry(self):
+        """Count a retried request"""
+        with self.lock:
+            self.stats['retries'] += 1
+
+    def get_stats(self):
+        """
+        Return the current rate and the request statistics
+
+        Returns:
+            dict: Current rate, request, error, slow response and retry counts, and mean latency
+        """
+        with self.lock:
+            stats = dict(self.stats)
+            stats['rate'] = self.rate
+        total_latency = stats.pop('total_latency')
+        successes = stats['requests'] - stats['errors']
+        stats['mean_latency'] = total_latency / successes if successes else None
+        return stats
+
+
+class Metrics:
+    """
+    Thread-safe counters and duration histograms of a scraper run. A series
+    is identified by its metric name and labels, as in Prometheus, and the
+    exporters receive the whole set at every checkpoint.
+    """
+
+    # Upper bounds in seconds of the histogram buckets
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    DESCRIPTIONS = {
+        'request_seconds': "Duration of the requests to the site by endpoint",
+        'requests_total': "Requests to the site by endpoint and status code or error",
+        'request_retries_total': "Requests retried after a server error or a timeout by endpoint",
+        'parse_seconds': "Time spent parsing a page by page type",
+        'flush_seconds': "Time spent writing a batch of patents by output",
+        'detail_cache_total': "Detail page cache lookups by result",
+        'session_expired_total': "Responses showing that the session had expired",
+    }
+
+    def __init__(self, prefix="inpi_"):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.exporters = []
+
+    def increment(self, name, value=1, **labels):
+        """
+        Add to a counter
+
+        Args:
+            name (str): Metric name
+            value (float): Amount to add
+            **labels: Labels of the series
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """
+        Record a duration in a histogram
+
+        Args:
+            name (str): Metric name
+            seconds (float): The duration
+            **labels: Labels of the series
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': [0] * len(self.BUCKETS), 'count': 0, 'sum': 0.0}
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    histogram['buckets'][i] += 1
+                    break
+            histogram['count'] += 1
+            histogram['sum'] += seconds
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Record the duration of a block of code in a histogram"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self):
+        """
+        Format every series in the Prometheus text exposition format
+
+        Returns:
+            str: The metrics
+        """
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, dict(value, buckets=list(value['buckets'])))
+                                for key, value in self.histograms.items())
+
+        def label_text(labels, extra=()):
+            items = [f'{name}="{value}"' for name, value in labels + tuple(extra)]
+            return "{" + ",".join(items) + "}" if items else ""
+
+        lines = []
+        described = set()
+
+        def describe(name, metric_type):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {self.prefix}{name} {self.DESCRIPTIONS.get(name, name)}")
+                lines.append(f"# TYPE {self.prefix}{name} {metric_type}")
+
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{self.prefix}{name}{label_text(labels)} {value}")
+
+        for (name, labels), histogram in histograms:
+            describe(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS, histogram['buckets']):
+                cumulative += count
+                lines.append(f"{self.prefix}{name}_bucket{label_text(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.prefix}{name}_bucket{label_text(labels, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{self.prefix}{name}_sum{label_text(labels)} {histogram['sum']:.6f}")
+            lines.append(f"{self.prefix}{name}_count{label_text(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def _quantile(self, histogram, q):
+        """Return the upper bound of the bucket holding the q quantile of a histogram"""
+        rank = q * histogram['count']
+        cumulative = 0
+        for bound, count in zip(self.BUCKETS, histogram['buckets']):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float('inf')
+
+    def export(self, final=False):
+        """
+        Send the metrics to every exporter
+
+        Args:
+            final (bool): Whether this is the last export of the run
+        """
+        for exporter in self.exporters:
+            try:
+                exporter.export(self, final=final)
+            except Exception as e:
+                print(f"Error exporting metrics: {e}")
+
+    def close(self):
+        """Export the final values and stop the exporters"""
+        self.export(final=True)
+        for exporter in self.exporters:
+            exporter.close()
+
+    def print_summary(self):
+        """Print the request, parse and flush timings and the counters of the run"""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+
+        print("Timings:")
+        for (name, labels), histogram in histograms:
+            label = ", ".join(f"{key}={value}" for key, value in labels)
+            mean = histogram['sum'] / histogram['count']
+            print(f"  {name} [{label}]: {histogram['count']} in {histogram['sum']:.2f}s, mean {mean * 1000:.1f}ms, "
+                  f"p50 <= {self._quantile(histogram, 0.5) * 1000:g}ms, p95 <= {self._quantile(histogram, 0.95) * 1000:g}ms")
+        print("Counters:")
+        for (name, labels), value in counters:
+            label = ", ".join(f"{key}={value}" for key, value in labels)
+            print(f"  {name} [{label}]: {value:g}")
+
+
+class PrometheusTextfileExporter:
+    """
+    Write the metrics to a file in the Prometheus text format, for the
+    textfile collector of node_exporter. The file is replaced atomically and
+    at most once every interval seconds.
+    """
+
+    def __init__(self, filename, interval=15.0):
+        self.filename = filename
+        self.interval = interval
+        self.last_export = None
+
+    def export(self, metrics, final=False):
+        """Write the metrics unless the file was written less than interval seconds ago"""
+        now = time.monotonic()
+        if not final and self.last_export is not None and now - self.last_export < self.interval:
+            return
+        self.last_export = now
+        with open(self.filename + ".tmp", 'w', encoding='utf-8') as f:
+            f.write(metrics.render())
+        os.replace(self.filename + ".tmp", self.filename)
+
+    def close(self):
+        """Nothing to release"""
+
+
+class MetricsHTTPExporter:
+    """
+    Serve the live metrics in the Prometheus text format on /metrics from a
+    background thread
+    """
+
+    def __init__(self, metrics, port, host="127.0.0.1"):
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"Serving metrics on http://{host}:{self.server.server_address[1]}/metrics")
+
+    def export(self, metrics, final=False):
+        """The endpoint always renders the live values"""
+
+    def close(self):
+        """Stop serving the metrics"""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ParquetSink:
+    """
+    Output sink that writes the saved patents to a Parquet dataset partitioned
+    by filing year. Each run keeps one writer per partition open and appends a
+    row group per flush. Publications, petitions and anuidades are stored as
+    nested list columns instead of JSON strings.
+    """
+
+    LIST_COLUMNS = ('applicants', 'inventors', 'ipc_codes', 'matched_queries')
+
+    def __init__(self, dataset_dir):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow is required for Parquet output: pip install pyarrow")
+
+        self.pa = pa
+        self.pq = pq
+        self.dataset_dir = dataset_dir
+        # The random suffix keeps runs started within the same second from sharing part files
+        self.run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        self.writers = {}
+        self.schema = self._build_schema()
+
+    def _build_schema(self):
+        """Return the Arrow schema of the dataset"""
+        pa = self.pa
+        string_columns = ['patent_id', 'patent_number', 'patent_number_raw', 'patent_number_full', 'filing_date',
+                          'filing_date_detail', 'publication_date', 'grant_date', 'title', 'ipc', 'abstract',
+                          'applicants_raw', 'inventors_raw', 'patent_agent', 'search_param', 'last_update_date',
+                          'fetched_at']
+        fields = [pa.field(column, pa.string()) for column in string_columns]
+        fields += [pa.field(column, pa.list_(pa.string())) for column in self.LIST_COLUMNS]
+        fields.append(pa.field('publications', pa.list_(pa.struct([
+            ('rpi', pa.string()), ('date', pa.string()), ('code', pa.string()),
+            ('has_pdf', pa.bool_()), ('complement', pa.string()),
+        ]))))
+        fields.append(pa.field('petitions', pa.list_(pa.struct([
+            ('section', pa.string()), ('service_code', pa.string()), ('has_payment', pa.bool_()),
+            ('protocol', pa.string()), ('date', pa.string()), ('client', pa.string()),
+        ]))))
+        fields.append(pa.field('anuidades', pa.list_(pa.struct([
+            ('number', pa.string()), ('status', pa.string()),
+        ]))))
+        return pa.schema(fields)
+
+    def _to_row(self, record):
+        """
+        Convert a saved patent record to a row of the dataset schema
+
+        Args:
+            record (dict): Patent record as written to the CSV
+
+        Returns:
+            dict: Row with nested values for the list columns
+        """
+        def value(column):
+            item = record.get(column)
+            if item is None or (isinstance(item, float) and pd.isna(item)):
+                return None
+            return item
+
+        def json_value(column):
+            item = value(column)
+            return json.loads(item) if isinstance(item, str) else item
+
+        row = {}
+        for field in self.schema:
+            if field.name in self.LIST_COLUMNS:
+                items = value(field.name)
+                row[field.name] = [str(item) for item in items] if isinstance(items, list) else None
+            elif field.name in ('publications', 'petitions'):
+                row[field.name] = json_value(f"{field.name}_json")
+            elif field.name == 'anuidades':
+                anuidades = json_value('anuidades_json')
+                row[field.name] = ([{'number': key.replace('anuidade_', ''), 'status': status}
+                                    for key, status in anuidades.items()] if anuidades else None)
+            else:
+                item = value(field.name)
+                row[field.name] = str(item) if item is not None else None
+        return row
+
+    def _partition(self, row):
+        """Return the filing year partition of a row"""
+        match = re.search(r'(\d{4})$', row.get('filing_date') or row.get('filing_date_detail') or '')
+        return match.group(1) if match else 'unknown'
+
+    def write(self, df):
+        """
+        Append the saved patents to the dataset, one row group per partition
+
+        Args:
+            df (DataFrame): Rows that were just appended to the CSV
+        """
+        partitions = {}
+        for record in df.to_dict('records'):
+            row = self._to_row(record)
+            partitions.setdefault(self._partition(row), []).append(row)
+
+        for year, rows in partitions.items():
+            writer = self.writers.get(year)
+            if writer is None:
+                partition_dir = os.path.join(self.dataset_dir, f"filing_year={year}")
+                os.makedirs(partition_dir, exist_ok=True)
+                writer = self.pq.ParquetWriter(os.path.join(partition_dir, f"part-{self.run_id}.parquet"), self.schema)
+                self.writers[year] = writer
+            writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+        print(f"Wrote {len(df)} patents to Parquet dataset {self.dataset_dir}")
+
+    def close(self):
+        """Finish the Parquet files written by this run"""
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+
+def read_parquet_dataset(dataset_dir, columns=None, filters=None):
+    """
+    Load the Parquet dataset written by ParquetSink, reading only the requested columns
+
+    Args:
+        dataset_dir (str): Folder of the dataset
+        columns (list, optional): Columns to load, e.g. ['patent_id', 'ipc_codes', 'grant_date']. If None, load all.
+        filters (list, optional): pyarrow filters on the columns or on the filing_year partition
+
+    Returns:
+        DataFrame: The loaded patents
+    """
+    import pyarrow.parquet as pq
+    table = pq.read_table(dataset_dir, columns=columns, filters=filters, partitioning='hive')
+    return table.to_pandas()
+
+
+class PatentStore:
+    """
+    SQLite store for patents, their publications, petitions and anuidades,
+    the search hits and the search progress. Every write is a transactional
+    upsert keyed on patent_id, so a crash never leaves a half-written file.
+    """
+
+    PATENT_COLUMNS = ['patent_id', 'patent_number', 'filing_date', 'title', 'ipc', 'patent_number_raw', 'search_param',
+                      'patent_number_full', 'filing_date_detail', 'publication_date', 'grant_date', 'applicants',
+                      'applicants_raw', 'patent_agent', 'ipc_codes', 'abstract', 'inventors_raw', 'inventors',
+                      'publications_json', 'petitions_json', 'anuidades_json', 'last_update_date', 'fetched_at']
+    LIST_COLUMNS = ('applicants', 'inventors', 'ipc_codes')
+    HIT_COLUMNS = ['patent_id', 'patent_number', 'filing_date', 'title', 'ipc', 'patent_number_raw', 'search_param']
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.conn = sqlite3.connect(db_file)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        """Create the tables if the database is new"""
+        columns = ', '.join(f"{column} TEXT" for column in self.PATENT_COLUMNS[1:])
+        with self.conn:
+            self.conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS patents (
+                    patent_id TEXT PRIMARY KEY,
+                    {columns},
+                    extra_json TEXT,
+                    has_details INTEGER NOT NULL DEFAULT 0,
+                    updated_at TEXT
+                );
+                CREATE INDEX IF NOT EXISTS patents_has_details ON patents (has_details);
+                CREATE TABLE IF NOT EXISTS publications (
+                    patent_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    rpi TEXT, date TEXT, code TEXT, has_pdf INTEGER, complement TEXT,
+                    PRIMARY KEY (patent_id, position)
+                );
+                CREATE TABLE IF NOT EXISTS petitions (
+                    patent_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    section TEXT, service_code TEXT, has_payment INTEGER, protocol TEXT, date TEXT, client TEXT,
+                    PRIMARY KEY (patent_id, position)
+                );
+                CREATE TABLE IF NOT EXISTS anuidades (
+                    patent_id TEXT NOT NULL,
+                    number TEXT NOT NULL,
+                    status TEXT,
+                    PRIMARY KEY (patent_id, number)
+                );
+                CREATE TABLE IF NOT EXISTS search_hits (
+                    patent_id TEXT PRIMARY KEY,
+                    patent_number TEXT, filing_date TEXT, title TEXT, ipc TEXT, patent_number_raw TEXT, search_param TEXT
+                );
+                CREATE TABLE IF NOT EXISTS search_progress (
+                    last_query TEXT NOT NULL,
+                    last_search_column TEXT NOT NULL,
+                    last_page_processed INTEGER NOT NULL,
+                    total_pages INTEGER NOT NULL,
+                    has_more_pages INTEGER NOT NULL,
+                    last_update_time TEXT,
+                    pages_done TEXT,
+                    partitions TEXT,
+                    PRIMARY KEY (last_query, last_search_column)
+                );
+            """)
+            # Databases created by earlier versions lack the newer columns
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(search_progress)")]
+            for column in ('pages_done', 'partitions'):
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE search_progress ADD COLUMN {column} TEXT")
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(patents)")]
+            for column in self.PATENT_COLUMNS:
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE patents ADD COLUMN {column} TEXT")
+
+    def patent_ids(self, with_details=False):
+        """
+        Return the IDs of the stored patents
+
+        Args:
+            with_details (bool): Only return patents whose details were fetched
+
+        Returns:
+            set: Patent IDs
+        """
+        query = "SELECT patent_id FROM patents"
+        if with_details:
+            query += " WHERE has_details = 1"
+        return {row[0] for row in self.conn.execute(query)}
+
+    def _value(self, record, column):
+        """Return a record value as stored in SQLite: lists as JSON, missing values as NULL"""
+        value = record.get(column)
+        if isinstance(value, list):
+            return json.dumps(value, ensure_ascii=False)
+        if value is None or (isinstance(value, float) and pd.isna(value)):
+            return None
+        return str(value)
+
+    def upsert_patents(self, records):
+        """
+        Insert or update patents and their child rows in a single transaction
+
+        Args:
+            records (list): Patent dictionaries as produced by fetch_all_details()
+        """
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        columns = self.PATENT_COLUMNS + ['extra_json', 'has_details', 'updated_at']
+        placeholders = ', '.join('?' for _ in columns)
+        updates = ', '.join(f"{column} = excluded.{column}" for column in columns[1:])
+        sql = (f"INSERT INTO patents ({', '.join(columns)}) VALUES ({placeholders}) "
+               f"ON CONFLICT(patent_id) DO UPDATE SET {updates}")
+
+        with self.conn:
+            for record in records:
+                patent_id = str(record['patent_id'])
+                values = [patent_id] + [self._value(record, column) for column in self.PATENT_COLUMNS[1:]]
+                extra = {key: self._value(record, key) for key in record if key not in self.PATENT_COLUMNS}
+                values.append(json.dumps(extra, ensure_ascii=False) if extra else None)
+                values.append(1 if self._value(record, 'patent_agent') is not None else 0)
+                values.append(now)
+                self.conn.execute(sql, values)
+
+                for table in ('publications', 'petitions', 'anuidades'):
+                    self.conn.execute(f"DELETE FROM {table} WHERE patent_id = ?", (patent_id,))
+
+                publications = json.loads(record['publications_json']) if self._value(record, 'publications_json') else []
+                self.conn.executemany(
+                    "INSERT INTO publications VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(patent_id, i, pub.get('rpi'), pub.get('date'), pub.get('code'), int(bool(pub.get('has_pdf'))),
+                      pub.get('complement')) for i, pub in enumerate(publications)])
+
+                petitions = json.loads(record['petitions_json']) if self._value(record, 'petitions_json') else []
+                self.conn.executemany(
+                    "INSERT INTO petitions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(patent_id, i, pet.get('section'), pet.get('service_code'), int(bool(pet.get('has_payment'))),
+                      pet.get('protocol'), pet.get('date'), pet.get('client')) for i, pet in enumerate(petitions)])
+
+                anuidades = json.loads(record['anuidades_json']) if self._value(record, 'anuidades_json') else {}
+                self.conn.executemany(
+                    "INSERT INTO anuidades VALUES (?, ?, ?)",
+                    [(patent_id, key.replace('anuidade_', ''), status) for key, status in anuidades.items()])
+
+    def save_search_state(self, search_state, new_hits):
+        """
+        Save the search progress and the hits found since the last save in a single transaction
+
+        Args:
+            search_state (dict): The scraper search state
+            new_hits (list): PatentHit records found since the last save
+        """
+        if search_state['last_query'] is None:
+            return
+
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO search_progress (last_query, last_search_column, last_page_processed, total_pages, "
+                "has_more_pages, last_update_time, pages_done, partitions) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(last_query, last_search_column) DO UPDATE SET "
+                "last_page_processed = excluded.last_page_processed, total_pages = excluded.total_pages, "
+                "has_more_pages = excluded.has_more_pages, last_update_time = excluded.last_update_time, "
+                "pages_done = excluded.pages_done, partitions = excluded.partitions",
+                (search_state['last_query'], search_state['last_search_column'], search_state['last_page_processed'],
+                 search_state['total_pages'], int(search_state['has_more_pages']), search_state['last_update_time'],
+                 json.dumps(search_state.get('pages_done') or []),
+                 json.dumps(search_state['partitions']) if search_state.get('partitions') else None))
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO search_hits ({', '.join(self.HIT_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in self.HIT_COLUMNS)})",
+                [[getattr(hit, column) for column in self.HIT_COLUMNS] for hit in new_hits])
+
+    def load_search_state(self, query=None, search_column=None):
+        """
+        Load the progress of a search
+
+        Args:
+            query (str, optional): Query of the search. If None, load the most recently updated search.
+            search_column (str, optional): Column of the search
+
+        Returns:
+            dict: Search state without found_patents, or None if no search was saved
+        """
+        if query is None:
+            row = self.conn.execute(
+                "SELECT * FROM search_progress ORDER BY last_update_time DESC LIMIT 1").fetchone()
+        else:
+            row = self.conn.execute(
+                "SELECT * FROM search_progress WHERE last_query = ? AND last_search_column = ?",
+                (query, search_column)).fetchone()
+        if row is None:
+            return None
+        state = dict(row)
+        state['has_more_pages'] = bool(state['has_more_pages'])
+        state['pages_done'] = json.loads(state['pages_done'] or '[]')
+        state['partitions'] = json.loads(state['partitions']) if state['partitions'] else None
+        state['found_patents'] = {}
+        return state
+
+    def count_hits(self):
+        """Return the number of stored search hits"""
+        return self.conn.execute("SELECT COUNT(*) FROM search_hits").fetchone()[0]
+
+    def pending_hits(self):
+        """
+        Return the search hits that are not stored as patents yet
+
+        Returns:
+            list: PatentHit records from the search results
+        """
+        rows = self.conn.execute(
+            "SELECT h.* FROM search_hits h LEFT JOIN patents p ON p.patent_id = h.patent_id "
+            "WHERE p.patent_id IS NULL ORDER BY h.rowid")
+        return [PatentHit.from_dict(dict(row)) for row in rows]
+
+    def to_dataframe(self):
+        """
+        Load all stored patents with the same columns as the CSV output
+
+        Returns:
+            DataFrame: The stored patents
+        """
+        df = pd.read_sql_query(f"SELECT {', '.join(self.PATENT_COLUMNS)} FROM patents ORDER BY rowid", self.conn)
+        for column in self.LIST_COLUMNS:
+            df[column] = df[column].map(lambda value: json.loads(value) if value else None)
+        return df
+
+    def iter_rows(self, columns):
+        """
+        Yield some columns of every patent with details
+
+        Args:
+            columns (list): Names of patent columns
+
+        Yields:
+            dict: Column values of a patent
+        """
+        rows = self.conn.execute(f"SELECT {', '.join(columns)} FROM patents WHERE has_details = 1 ORDER BY rowid")
+        for row in rows:
+            yield dict(row)
+
+    def get_patents(self, patent_ids):
+        """
+        Load full patent records as they were saved, including their extra fields
+
+        Args:
+            patent_ids (iterable): IDs of the patents to load
+
+        Returns:
+            dict: Patent dictionaries by patent ID
+        """
+        patents = {}
+        for patent_id in patent_ids:
+            row = self.conn.execute(f"SELECT {', '.join(self.PATENT_COLUMNS)}, extra_json FROM patents "
+                                    f"WHERE patent_id = ?", (patent_id,)).fetchone()
+            if row is None:
+                continue
+            patent = dict(row)
+            extra = patent.pop('extra_json')
+            if extra:
+                patent.update(json.loads(extra))
+            for column in self.LIST_COLUMNS:
+                patent[column] = json.loads(patent[column]) if patent[column] else None
+            patents[patent_id] = patent
+        return patents
+
+    def close(self):
+        """Close the database connection"""
+        self.conn.close()
+
+
+class PageCache:
+    """
+    Cache of the raw search and detail pages. Pages are lz4 compressed and
+    sharded into directories by a hash of their key, so a page is found by
+    computing its path: a detail page by patent ID, a search page by a hash
+    of the full query and search column. Pages saved by earlier versions in
+    the flat inpi_cache layout are still found until migrate_flat() imports them.
+    """
+
+    PAGES_DIR = "pages"
+
+    def __init__(self, cache_dir=CACHE_DIR, compress=True):
+        self.cache_dir = cache_dir
+        self.lz4 = None
+        if compress:
+            try:
+                import lz4.frame
+                self.lz4 = lz4.frame
+            except ImportError:
+                print("lz4 is not installed, caching pages uncompressed")
+        self.extension = ".html.lz4" if self.lz4 else ".html"
+
+    def _shard(self, key):
+        """Return the hash of a key and the directory it is sharded into"""
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return digest, os.path.join(digest[:2], digest[2:4])
+
+    def detail_path(self, patent_id):
+        """Return the cache file name of a patent detail page"""
+        _, shard = self._shard(str(patent_id))
+        return os.path.join(self.cache_dir, self.PAGES_DIR, "details", shard, f"patent_{patent_id}{self.extension}")
+
+    def search_dir(self, query, search_column):
+        """Return the cache folder of the result pages of a search"""
+        digest, shard = self._shard(f"{search_column}\t{query}")
+        return os.path.join(self.cache_dir, self.PAGES_DIR, "search", shard, digest)
+
+    def _write(self, path, html_content):
+        """Write a page through a temporary file, so readers never see a partial page"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = html_content.encode('utf-8')
+        if path.endswith(".lz4"):
+            data = self.lz4.compress(data)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def save_detail(self, patent_id, html_content):
+        """
+        Save a patent detail page
+
+        Args:
+            patent_id (str): The patent ID
+            html_content (str): The HTML content to save
+        """
+        self._write(self.detail_path(patent_id), html_content)
+
+    def save_search_page(self, query, search_column, page, html_content, key_info=None):
+        """
+        Save a page of search results
+
+        Args:
+            query (str): Search query
+            search_column (str): Column searched
+            page (int): The page number
+            html_content (str): The HTML content to save
+            key_info (dict, optional): Description of the search saved next to its pages.
+                                       Defaults to the query and search column.
+        """
+        folder = self.search_dir(query, search_column)
+        info_file = os.path.join(folder, "query.json")
+        if not os.path.exists(info_file):
+            os.makedirs(folder, exist_ok=True)
+            with open(info_file, 'w', encoding='utf-8') as f:
+                json.dump(key_info or {'query': query, 'search_column': search_column}, f, ensure_ascii=False)
+        self._write(os.path.join(folder, f"page_{page}{self.extension}"), html_content)
+
+    def find_detail(self, patent_id):
+        """
+        Return the cache file of a patent detail page
+
+        Args:
+            patent_id (str): The patent ID
+
+        Returns:
+            str: Path of the cached page, or None if it is not cached
+        """
+        path = self.detail_path(patent_id)
+        base = path[:-len(self.extension)]
+        candidates = [base + ".html.lz4", base + ".html",
+                      os.path.join(self.cache_dir, "details", f"patent_{patent_id}.html")]
+        for candidate in candidates:
+            if os.path.exists(candidate):
+                return candidate
+        return None
+
+    def list_pages(self):
+        """
+        List the cached search and detail pages, in both layouts
+
+        Returns:
+            tuple: Lists of search page paths and detail page paths
+        """
+        pages_dir = os.path.join(self.cache_dir, self.PAGES_DIR)
+        search_files = glob.glob(os.path.join(self.cache_dir, "search_*_page_*.html"))
+        detail_files = glob.glob(os.path.join(self.cache_dir, "details", "patent_*.html"))
+        for extension in (".html", ".html.lz4"):
+            search_files += glob.glob(os.path.join(pages_dir, "search", "*", "*", "*", f"page_*{extension}"))
+            detail_files += glob.glob(os.path.join(pages_dir, "details", "*", "*", f"patent_*{extension}"))
+        return sorted(search_files, key=_cached_page_number), sorted(detail_files)
+
+    def migrate_flat(self, remove=False):
+        """
+        Import the pages of the flat cache layout into the sharded store.
+        The flat layout only kept an 8 character hash of the query, so those
+        search pages are stored under that hash instead of the full query.
+
+        Args:
+            remove (bool): Delete every flat file once it is imported
+
+        Returns:
+            tuple: Number of search pages and detail pages imported
+        """
+        search_count = detail_count = 0
+        for path in glob.glob(os.path.join(self.cache_dir, "search_*_page_*.html")):
+            match = re.search(r'search_(\w+)_page_(\d+)\.html$', path)
+            query_hash, page = match.group(1), int(match.group(2))
+            self.save_search_page(f"legacy:{query_hash}", '', page, read_cached_page(path),
+                                  key_info={'legacy_query_hash': query_hash})
+            search_count += 1
+            if remove:
+                os.remove(path)
+
+        for path in glob.glob(os.path.join(self.cache_dir, "details", "patent_*.html")):
+            patent_id = re.search(r'patent_(\d+)\.html$', path).group(1)
+            target = self.detail_path(patent_id)
+            if not os.path.exists(target):
+                self._write(target, read_cached_page(path))
+                # Keep the download time, which decides the freshness of the page
+                mtime = os.path.getmtime(path)
+                os.utime(target, (mtime, mtime))
+            detail_count += 1
+            if remove:
+                os.remove(path)
+
+        return search_count, detail_count
+
+
+def read_cached_page(path):
+    """
+    Read a cached page, decompressing it if needed
+
+    Args:
+        path (str): Path of the cached page
+
+    Returns:
+        str: HTML content of the page
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if path.endswith(".lz4"):
+        import lz4.frame
+        data = lz4.frame.decompress(data)
+    return data.decode('utf-8')
+
+
+class PhaseProfiler:
+    """
+    Opt-in profiler splitting a run into phases such as auth, search and
+    detail_fetch. In "sample" mode a background thread records the stacks of
+    the threads inside a phase a hundred times a second, cheap enough to keep
+    on in production, and writes them in the collapsed format read by
+    flamegraph tools. In "cprofile" mode every phase gets its own cProfile
+    profile per thread, merged into one pstats file per phase. Optionally a
+    tracemalloc snapshot is kept at the end of each phase.
+    """
+
+    MODES = ('sample', 'cprofile')
+
+    def __init__(self, output_dir="profiles", mode="sample", interval=0.01, trace_memory=False,
+                 memory_interval=30.0):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown profiling mode {mode}, expected one of {self.MODES}")
+        self.output_dir = output_dir
+        self.mode = mode
+        self.interval = interval
+        self.trace_memory = trace_memory
+        self.memory_interval = memory_interval
+        self.run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        os.makedirs(output_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.active = {}  # Phase stack of every thread inside a phase
+        self.timings = {}  # Calls and wall time of every phase
+        self.profiles = {}  # cProfile profiles by (phase, thread)
+        self.samples = {}  # Collapsed stack counts by phase
+        self.snapshots = {}  # Last tracemalloc snapshot and its time by phase
+
+        if self.trace_memory:
+            tracemalloc.start()
+            self.baseline = tracemalloc.take_snapshot()
+
+        self.stopped = threading.Event()
+        self.sampler = None
+        if self.mode == 'sample':
+            self.sampler = threading.Thread(target=self._sample, daemon=True)
+            self.sampler.start()
+
+    @contextmanager
+    def phase(self, name):
+        """Attribute the work done by the calling thread in this block to a phase"""
+        thread_id = threading.get_ident()
+        stack = self.active.setdefault(thread_id, [])
+        outer = stack[-1] if stack else None
+        if outer == name:
+            # Recursive entries belong to the outer one
+            yield
+            return
+
+        if self.mode == 'cprofile':
+            if outer is not None:
+                self._profile(outer, thread_id).disable()
+            self._profile(name, thread_id).enable()
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            if self.mode == 'cprofile':
+                self._profile(name, thread_id).disable()
+                if outer is not None:
+                    self._profile(outer, thread_id).enable()
+            with self.lock:
+                calls, total = self.timings.get(name, (0, 0.0))
+                self.timings[name] = (calls + 1, total + elapsed)
+            if self.trace_memory:
+                self._snapshot(name)
+
+    def _profile(self, name, thread_id):
+        """Return the cProfile profile of a phase in a thread"""
+        key = (name, thread_id)
+        profile = self.profiles.get(key)
+        if profile is None:
+            with self.lock:
+                profile = self.profiles.setdefault(key, cProfile.Profile())
+        return profile
+
+    def _sample(self):
+        """Record the stacks of the threads inside a phase until the profiler is closed"""
+        while not self.stopped.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id, stack in list(self.active.items()):
+                if not stack:
+                    continue
+                frame = frames.get(thread_id)
+                calls = []
+                while frame is not None:
+                    code = frame.f_code
+                    calls.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                key = ";".join(reversed(calls))
+                with self.lock:
+                    counts = self.samples.setdefault(stack[-1], {})
+                    counts[key] = counts.get(key, 0) + 1
+
+    def _snapshot(self, name):
+        """Keep a tracemalloc snapshot at the end of a phase, at most once every memory_interval seconds"""
+        now = time.monotonic()
+        with self.lock:
+            last = self.snapshots.get(name)
+            if last is not None and now - last[1] < self.memory_interval:
+                return
+            self.snapshots[name] = (None, now)
+        snapshot = tracemalloc.take_snapshot()
+        with self.lock:
+            self.snapshots[name] = (snapshot, now)
+
+    def _filename(self, name, extension):
+        """Return the output file name of a phase"""
+        return os.path.join(self.output_dir, f"{self.run_id}_{name}.{extension}")
+
+    def close(self):
+        """Stop profiling, write the profile files of every phase and print the time spent in each"""
+        self.stopped.set()
+        if self.sampler is not None:
+            self.sampler.join()
+
+        if self.mode == 'cprofile':
+            by_phase = {}
+            for (name, _), profile in self.profiles.items():
+                profile.disable()
+                by_phase.setdefault(name, []).append(profile)
+            for name, profiles in by_phase.items():
+                stats = pstats.Stats(profiles[0])
+                for profile in profiles[1:]:
+                    stats.add(profile)
+                stats.dump_stats(self._filename(name, "prof"))
+        else:
+            for name, counts in self.samples.items():
+                with open(self._filename(name, "folded"), 'w', encoding='utf-8') as f:
+                    for stack, count in sorted(counts.items(), key=lambda item: -item[1]):
+                        f.write(f"{stack} {count}\n")
+
+        if self.trace_memory:
+            for name, (snapshot, _) in self.snapshots.items():
+                if snapshot is None:
+                    continue
+                snapshot.dump(self._filename(name, "tracemalloc"))
+                with open(self._filename(name, "memory.txt"), 'w', encoding='utf-8') as f:
+                    for stat in snapshot.compare_to(self.baseline, 'lineno')[:25]:
+                        f.write(f"{stat}\n")
+            tracemalloc.stop()
+
+        # Phase times add up the time of every thread and include the phases nested in them
+        print(f"Profiles of run {self.run_id} written to {self.output_dir}")
+        for name, (calls, total) in sorted(self.timings.items(), key=lambda item: -item[1][1]):
+            print(f"  {name}: {calls} calls, {total:.2f}s across threads")
+
+
+def profiled_phase(name):
+    """Decorate a scraper method so it runs inside a phase of the scraper's profiler, if one is set"""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.profiler is None:
+                return method(self, *args, **kwargs)
+            with self.profiler.phase(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
 
 class INPIPatentScraper:
-    def __init__(self, csv_file, state_file, cookies=None, debug=False, use_browser_cookies=True):
+    def __init__(self, csv_file, state_file, cookies=None, debug=False, use_browser_cookies=True, session_check_ttl=300,
+                 use_detail_cache=True, detail_cache_max_age=None, parser_backend=DEFAULT_PARSER_BACKEND,
+                 parse_memo_size=1024, db_file=None, journal_compact_threshold=200, requests_per_second=1.0,
+                 max_requests_per_second=2.0, max_retries=3):
         self.base_url = "https://busca.inpi.gov.br/pePI/servlet/PatenteServletController"
         self.login_url = "https://busca.inpi.gov.br/pePI/servlet/LoginController"
+        self.auth_check_url = "https://busca.inpi.gov.br/pePI/jsp/patentes/PatenteSearchBasico.jsp"
         self.session = requests.Session()
         self.debug = debug
         self.csv_file = csv_file
         self.state_file = state_file
+        self.parser_backend = self._check_parser_backend(parser_backend)
 
         # Headers to mimic a browser request
         self.headers = {
@@ -58,28 +1260,131 @@ class INPIPatentScraper:
 
         # self.session.headers.update(self.headers)
 
+        # Politeness: every request goes through the adaptive rate limiter, and
+        # server errors and timeouts are retried with exponential backoff and jitter
+        self.rate_limiter = AdaptiveRateLimiter(rate=requests_per_second, max_rate=max_requests_per_second)
+        self.max_retries = max_retries
+        self.backoff_base = 2.0
+        self.backoff_max = 60.0
+
         # Session status
         self.authenticated = False
         self.session_expired = False
 
+        # Session validity cache: responses that are not login pages prove the
+        # session is alive, so a real probe is only needed after a login page
+        # was seen or when nothing has validated the session for this many seconds
+        self.session_check_ttl = session_check_ttl
+        self.session_validated_at = None
+        self.session_stats = {
+            'probes': 0,
+            'probes_saved': 0,
+        }
+
+        # Read-through cache for detail pages. A cached page is served when it is
+        # younger than detail_cache_max_age seconds, or when its "Dados atualizados até"
+        # date is not older than the most recent update date seen on the site
+        self.use_detail_cache = use_detail_cache
+        self.detail_cache_max_age = detail_cache_max_age
+        self.site_update_date = None
+        self.cache_stats = {
+            'hits': 0,
+            'misses': 0,
+            'stale': 0,
+        }
+        self.cache_stats_lock = threading.Lock()
+
+        # Counters and timings of the run, sent to the exporters in metrics.exporters
+        self.metrics = Metrics()
+        # PhaseProfiler of the methods decorated with profiled_phase, if profiling is enabled
+        self.profiler = None
+
+        # Parsed detail pages by content hash, so an unchanged page is never parsed twice
+        self.parse_memo = OrderedDict()
+        self.parse_memo_size = parse_memo_size
+        self.parse_memo_lock = threading.Lock()
+        self.parse_stats = {
+            'parsed': 0,
+            'memo_hits': 0,
+        }
+
+        # Extra output sinks that receive every batch appended to the CSV
+        self.sinks = []
+
+        # When set, patents and search state are kept in SQLite instead of the CSV and JSON files
+        self.store = PatentStore(db_file) if db_file else None
+
+        # Raw search and detail pages
+        self.page_cache = PageCache(CACHE_DIR)
+
+        # Queries that matched each patent in batch mode
+        self.query_matches = {}
+
         # Initialize storage for scraped data
         self.patents = []
         self.detailed_patents = []
 
         # Track already processed patents
         self.processed_patent_ids = set()
+        # Index of the patents stored in the CSV: all IDs, and the IDs whose row has details
+        self.csv_patent_ids = set()
+        self.csv_detailed_ids = set()
+        self.csv_columns = None
+
+        # Serializes session probes when several workers share the scraper
+        self.session_lock = threading.Lock()
 
         # Search state
-        self.search_state = {
+        self.search_state = self._new_search_state()
+
+        # IDs of the found patents added since the search state was last saved
+        self.unsaved_found_ids = []
+
+        # Checkpoints are appended to a journal next to the state file, which is
+        # rewritten as a full snapshot once the journal has this many entries
+        self.journal_compact_threshold = journal_compact_threshold
+        self.journal_entries = 0
+
+    def _new_search_state(self):
+        """Return an empty search state"""
+        return {
             'last_query': None,
             'last_search_column': None,
             'last_page_processed': 0,
             'total_pages': 0,
             'has_more_pages': True,
+            'pages_done': [],  # Processed pages after the last_page_processed prefix
+            'partitions': None,  # Filing date ranges of a partitioned search
             'found_patents': {},  # Store all found patents by ID
             'last_update_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
 
+    def _check_parser_backend(self, parser_backend):
+        """
+        Check that a parser backend can be used, falling back to html.parser
+
+        Args:
+            parser_backend (str): One of PARSER_BACKENDS
+
+        Returns:
+            str: The backend that will be used
+        """
+        if parser_backend not in PARSER_BACKENDS:
+            raise ValueError(f"Unknown parser backend {parser_backend!r}, expected one of {PARSER_BACKENDS}")
+
+        if parser_backend == 'lxml':
+            try:
+                import lxml  # noqa: F401
+            except ImportError:
+                print("lxml is not installed, falling back to html.parser")
+                return 'html.parser'
+
+        return parser_backend
+
+    def _make_soup(self, html_content):
+        """Parse HTML content with the configured parser backend"""
+        return BeautifulSoup(html_content, self.parser_backend)
+
     def load_existing_data(self, csv_filename, state_filename):
         """
         Load existing data from CSV and search state from JSON file
@@ -91,41 +1396,43 @@ class INPIPatentScraper:
         Returns:
             set: Set of patent IDs that have already been processed
         """
+        if self.store is not None:
+            return self._load_existing_store_data()
+
         # Load processed patents from CSV
         try:
-            if os.path.exists(csv_filename):
-                df = pd.read_csv(csv_filename)
-                if 'patent_id' in df.columns:
-                    processed_ids = set(df['patent_id'].astype(str).tolist())
-                    print(f"Loaded {len(processed_ids)} processed patent IDs from {csv_filename}")
-                    self.processed_patent_ids = processed_ids
-
-                    # Create a dictionary to track which patents have details in the CSV
-                    self.csv_patents_dict = {}
-                    for _, row in df.iterrows():
-                        patent_id = str(row['patent_id'])
-                        self.csv_patents_dict[patent_id] = {
-                            'patent_number': row.get('patent_number', ''),
-                            'has_details': 'patent_agent' in df.columns and not pd.isna(row.get('patent_agent', '')),
-                            'row': row.to_dict()
-                        }
-
-                    print(f"Created reference dictionary with {len(self.csv_patents_dict)} patents")
+            if self._load_csv_index(csv_filename):
+                if 'patent_id' in self.csv_columns:
+                    self.processed_patent_ids = set(self.csv_patent_ids)
+                    print(f"Loaded {len(self.processed_patent_ids)} processed patent IDs from {csv_filename}")
+                    print(f"Created reference index with {len(self.csv_patent_ids)} patents "
+                          f"({len(self.csv_detailed_ids)} with details)")
                 else:
                     print(f"No 'patent_id' column found in {csv_filename}")
             else:
                 print(f"File {csv_filename} does not exist yet")
-                self.csv_patents_dict = {}
         except Exception as e:
             print(f"Error loading existing data from CSV: {e}")
-            self.csv_patents_dict = {}
+            self.csv_patent_ids = set()
+            self.csv_detailed_ids = set()
+
+        self._load_search_state(state_filename)
+
+        return self.processed_patent_ids
 
-        # Load search state from JSON file
+    def _load_search_state(self, state_filename):
+        """
+        Load the search state from a JSON file and import the found patents
+        that still need details
+
+        Args:
+            state_filename (str): Name of the JSON file containing search state
+        """
+        # Load search state from JSON file and replay the checkpoints journaled after it
         try:
-            if os.path.exists(state_filename):
-                with open(state_filename, 'r', encoding='utf-8') as f:
-                    self.search_state = json.load(f)
-                print(f"Loaded search state from {state_filename}")
+            if os.path.exists(state_filename) or os.path.exists(self._journal_file(state_filename)):
+                self._recover_search_state(state_filename)
+                print(f"Loaded search state from {state_filename} and {self.journal_entries} journal entries")
                 print(f"  Last query: {self.search_state['last_query']}")
                 print(f"  Last page processed: {self.search_state['last_page_processed']}")
                 print(f"  Total pages: {self.search_state['total_pages']}")
@@ -138,8 +1445,7 @@ class INPIPatentScraper:
                 for patent_id, patent_data in self.search_state['found_patents'].items():
                     if patent_id not in self.processed_patent_ids:
                         # Check if it has details in the CSV
-                        has_details = patent_id in self.csv_patents_dict and self.csv_patents_dict[patent_id].get('has_details', False)
-                        if not has_details:
+                        if patent_id not in self.csv_detailed_ids:
                             patents_to_process.append(patent_data)
 
                 if patents_to_process:
@@ -150,232 +1456,1060 @@ class INPIPatentScraper:
         except Exception as e:
             print(f"Error loading search state: {e}")
 
+    def _load_existing_store_data(self):
+        """
+        Load the patent index, the search progress and the pending search hits from the SQLite store
+
+        Returns:
+            set: Set of patent IDs that have already been processed
+        """
+        self.csv_patent_ids = self.store.patent_ids()
+        self.csv_detailed_ids = self.store.patent_ids(with_details=True)
+        self.processed_patent_ids = set(self.csv_patent_ids)
+        print(f"Loaded {len(self.csv_patent_ids)} patents from {self.store.db_file} "
+              f"({len(self.csv_detailed_ids)} with details)")
+
+        search_state = self.store.load_search_state()
+        if search_state:
+            self.search_state = search_state
+            print(f"Loaded search state from {self.store.db_file}")
+            print(f"  Last query: {self.search_state['last_query']}")
+            print(f"  Last page processed: {self.search_state['last_page_processed']}")
+            print(f"  Total pages: {self.search_state['total_pages']}")
+            print(f"  Has more pages: {self.search_state['has_more_pages']}")
+            print(f"  Found patents: {self.store.count_hits()}")
+
+        patents_to_process = self.store.pending_hits()
+        if patents_to_process:
+            self.patents.extend(patents_to_process)
+            print(f"Imported {len(patents_to_process)} patents from search state for processing")
+        else:
+            print("No patents from search state need processing")
+
         return self.processed_patent_ids
 
-    def save_search_state(self):
+    def _journal_file(self, state_filename=None):
+        """Return the name of the journal file of a search state file"""
+        return f"{state_filename or self.state_file}.journal"
+
+    def _recover_search_state(self, state_filename):
+        """
+        Load the last search state snapshot and replay the journal written after it
+
+        Args:
+            state_filename (str): Name of the JSON file containing the snapshot
+        """
+        if os.path.exists(state_filename):
+            with open(state_filename, 'r', encoding='utf-8') as f:
+                self.search_state = json.load(f)
+            self.search_state['found_patents'] = {patent_id: PatentHit.from_dict(patent_data) for patent_id, patent_data
+                                                  in self.search_state.get('found_patents', {}).items()}
+
+        self.journal_entries = 0
+        journal_filename = self._journal_file(state_filename)
+        if not os.path.exists(journal_filename):
+            return
+
+        valid_length = 0
+        with open(journal_filename, 'rb') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line.decode('utf-8'))
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    entry = None
+                if entry is None or not line.endswith(b"\n"):
+                    # A checkpoint interrupted while being written: drop it so new entries start on a clean line
+                    print(f"Ignoring incomplete entry in {journal_filename}")
+                    break
+                found_patents = entry.pop('found_patents', {})
+                self.search_state.update(entry)
+                self.search_state.setdefault('found_patents', {}).update(
+                    (patent_id, PatentHit.from_dict(patent_data)) for patent_id, patent_data in found_patents.items())
+                self.journal_entries += 1
+                valid_length += len(line)
+
+        if valid_length < os.path.getsize(journal_filename):
+            with open(journal_filename, 'r+b') as f:
+                f.truncate(valid_length)
+
+    def _compact_search_state(self):
+        """
+        Write the whole search state as a new snapshot and empty the journal.
+        The snapshot is written to a temporary file and renamed, so it is never
+        left half-written; replaying the old journal over it is harmless.
+        """
+        filename = self.state_file
+        snapshot = dict(self.search_state)
+        snapshot['found_patents'] = {patent_id: patent_data.to_dict()
+                                     for patent_id, patent_data in self.search_state['found_patents'].items()}
+        with open(filename + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(filename + ".tmp", filename)
+
+        with open(self._journal_file(), 'w', encoding='utf-8'):
+            pass
+        self.journal_entries = 0
+        print(f"Compacted search state into {filename}")
+
+    def _record_found_patent(self, patent_data):
+        """
+        Store a patent found in the search results in the search state
+
+        Args:
+            patent_data (PatentHit): Patent from the search results
+        """
+        self.search_state['found_patents'][patent_data.patent_id] = patent_data
+        self.unsaved_found_ids.append(patent_data.patent_id)
+
+    @profiled_phase("persistence")
+    def save_search_state(self, compact=False):
+        """
+        Save the current search state to the SQLite store if one is used.
+        Otherwise append the page progress and the newly found patents to the
+        journal of the JSON state file, so a checkpoint costs time proportional
+        to what changed since the last one.
+
+        Args:
+            compact (bool): Rewrite the JSON snapshot and empty the journal now
+        """
+        filename = self.state_file
+        try:
+            # Update last update time
+            self.search_state['last_update_time'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+            if self.store is not None:
+                found_patents = self.search_state['found_patents']
+                new_hits = [found_patents[patent_id] for patent_id in dict.fromkeys(self.unsaved_found_ids)]
+                self.store.save_search_state(self.search_state, new_hits)
+                self.unsaved_found_ids = []
+                print(f"Saved search state to {self.store.db_file} ({len(new_hits)} new patents)")
+                self.metrics.export()
+                return
+
+            found_patents = self.search_state['found_patents']
+            entry = {key: value for key, value in self.search_state.items() if key != 'found_patents'}
+            entry['found_patents'] = {patent_id: found_patents[patent_id].to_dict()
+                                      for patent_id in dict.fromkeys(self.unsaved_found_ids)}
+
+            with open(self._journal_file(), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.unsaved_found_ids = []
+            self.journal_entries += 1
+            print(f"Saved search state to {self._journal_file()} ({len(entry['found_patents'])} new patents)")
+
+            if compact or self.journal_entries >= self.journal_compact_threshold:
+                self._compact_search_state()
+            self.metrics.export()
+        except Exception as e:
+            print(f"Error saving search state: {e}")
+
+    def _request(self, method, url, session=None, rate_limited=True, endpoint="other", **kwargs):
+        """
+        Send a request through the rate limiter, retrying server errors and
+        timeouts with exponential backoff and jitter
+
+        Args:
+            method (str): HTTP method
+            url (str): URL to request
+            session (requests.Session, optional): Session to use instead of self.session
+            rate_limited (bool): Whether to wait for the rate limiter
+            endpoint (str): Name of the endpoint in the request metrics
+            **kwargs: Arguments passed to requests
+
+        Returns:
+            requests.Response: The response. The last error response is returned
+                               when all retries fail, and the last timeout or
+                               connection error is raised.
+        """
+        limiter = self.rate_limiter
+        metrics = self.metrics
+        for attempt in range(self.max_retries + 1):
+            if rate_limited:
+                limiter.acquire()
+
+            start = time.monotonic()
+            error = None
+            try:
+                response = (session or self.session).request(method, url, **kwargs)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                metrics.observe('request_seconds', time.monotonic() - start, endpoint=endpoint)
+                metrics.increment('requests_total', endpoint=endpoint, status=type(e).__name__)
+                limiter.record_failure()
+                error = e
+                reason = type(e).__name__
+            else:
+                latency = time.monotonic() - start
+                metrics.observe('request_seconds', latency, endpoint=endpoint)
+                metrics.increment('requests_total', endpoint=endpoint, status=response.status_code)
+                if response.status_code < 500 and response.status_code != 429:
+                    limiter.record_success(latency)
+                    return response
+                limiter.record_failure()
+                reason = f"status {response.status_code}"
+
+            if attempt == self.max_retries:
+                if error is not None:
+                    raise error
+                return response
+
+            delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.5)
+            limiter.record_retry()
+            metrics.increment('request_retries_total', endpoint=endpoint)
+            print(f"Request failed ({reason}), retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})")
+            time.sleep(delay)
+
+    def print_rate_stats(self):
+        """Print the current request rate and the retry statistics"""
+        stats = self.rate_limiter.get_stats()
+        rate = f"{stats['rate']:.2f} requests/s" if stats['rate'] else "unlimited"
+        latency = f"{stats['mean_latency']:.2f}s" if stats['mean_latency'] is not None else "n/a"
+        print(f"Requests: {stats['requests']} sent, {stats['errors']} errors, {stats['slow_responses']} slow, "
+              f"{stats['retries']} retries, mean latency {latency}, current rate {rate}")
+
+    def check_and_renew_session(self):
+        """
+        Check if the session has expired and renew it if necessary.
+        The session is only probed over the network when it has not been
+        validated by a response within the last session_check_ttl seconds.
+
+        Returns:
+            bool: True if session is valid or was successfully renewed, False otherwise
+        """
+        with self.session_lock:
+            if self.session_expired:
+                return False
+
+            if self.session_validated_at is not None and self.session_check_ttl:
+                if time.monotonic() - self.session_validated_at < self.session_check_ttl:
+                    self.session_stats['probes_saved'] += 1
+                    return True
+
+            return self.is_authenticated()
+
+    def _track_session(self, html_content):
+        """
+        Update the session validity cache from a response we already have
+
+        Args:
+            html_content (str): HTML content of a search or detail response
+
+        Returns:
+            bool: True if the response is a login page, False otherwise
+        """
+        if self.is_login_page(html_content):
+            # Force a real probe on the next check
+            self.session_validated_at = None
+            self.metrics.increment('session_expired_total')
+            return True
+
+        self.session_validated_at = time.monotonic()
+        return False
+
+    def print_session_stats(self):
+        """Print how many authentication probes were run and how many were saved"""
+        probes = self.session_stats['probes']
+        saved = self.session_stats['probes_saved']
+        print(f"Session checks: {probes} probes, {saved} saved by the validity cache")
+
+    def search(self, query, search_column, max_pages=None, continue_from_last=True, stop_after_known_pages=None):
+        """
+        Perform a search for patents with the given query
+
+        Args:
+            query (str): Search query (e.g. "petroleo brasileiro")
+            search_column (str): Column to search in (e.g. "NomeDepositante", "Titulo", etc.)
+            max_pages (int, optional): Maximum number of pages to scrape. If None, scrape all pages.
+            continue_from_last (bool): Whether to continue from the last page processed
+            stop_after_known_pages (int, optional): Incremental crawl. Restart the search from the first
+                page and stop after this many consecutive pages containing only patents already known.
+
+        Returns:
+            DataFrame: Pandas DataFrame containing all scraped patent information
+        """
+        # Check if session is valid
+        if not self.check_and_renew_session():
+            return None
+
+        # Patents known before this crawl, and the number of fully known pages in a row
+        known_ids = None
+        known_run = 0
+        if stop_after_known_pages:
+            known_ids = set(self.processed_patent_ids) | set(self.search_state['found_patents'])
+            known_ids.update(patent.patent_id for patent in self.patents)
+
+        # Hits still waiting for their details are not queued twice when their page is parsed again
+        queued_ids = {patent.patent_id for patent in self.patents}
+
+        # Check if we should continue a previous search
+        start_page = 1
+        if stop_after_known_pages:
+            # New filings show up on the first pages, so an incremental crawl always starts over
+            self._reset_search_state(query, search_column)
+        elif continue_from_last and self.search_state['last_query'] == query and self.search_state['last_search_column'] == search_column:
+            # Continue from previous search regardless of has_more_pages
+            start_page = self.search_state['last_page_processed'] + 1
+            print(f"Continuing search from page {start_page}")
+
+            # If has_more_pages is False, we've already processed all pages
+            if not self.search_state['has_more_pages']:
+                print("All pages have already been processed. Skipping search query.")
+                return self._patents_frame()
+        else:
+            self._reset_search_state(query, search_column)
+
+        # If we're starting a new search or starting from page 1
+        if start_page == 1:
+            page_content = self._submit_search(query, search_column)
+            if page_content is None:
+                return None
+
+            # Parse first page
+            known_counts = {}
+            self.patents.extend(self._skip_queued(self._parse_page(page_content, known_ids, known_counts), queued_ids))
+
+            # Update search state - first page is processed
+            self._mark_page_done(1)
+            known_run = self._update_known_run(1, known_counts, known_run)
+
+            # Save the page content as HTML
+            self._save_page_content(page_content, page=1)
+
+            # Get total number of pages
+            total_pages = self._read_total_pages(page_content)
+        else:
+            # We're continuing from a previous search
+            total_pages = self.search_state['total_pages']
+
+        # Set max_pages if not specified
+        if max_pages is None:
+            max_pages = total_pages
+        else:
+            max_pages = min(max_pages, total_pages)
+
+        # Pages already retrieved by a parallel search are skipped
+        pages_done = self._pages_done()
+
+        # Scrape remaining pages
+        for page in range(start_page, max_pages + 1):
+            if page > 1:
+                if page in pages_done:
+                    continue
+
+                print(f"Scraping page {page} of {max_pages}")
+
+                # Check if session is still valid
+                if not self.check_and_renew_session():
+                    print("Failed to maintain session. Saving progress and exiting.")
+                    self.search_state['has_more_pages'] = True
+                    self.save_search_state()
+                    break
+
+                page_content = self._fetch_result_page(page)
+                if page_content is None:
+                    # The search state already records where we stopped
+                    self.search_state['has_more_pages'] = True
+                    self.save_search_state()
+                    break
+
+                # Save the page content as HTML
+                self._save_page_content(page_content, page=page)
+
+                # Parse the page
+                known_counts = {}
+                self.patents.extend(self._skip_queued(self._parse_page(page_content, known_ids, known_counts), queued_ids))
+
+                # Update search state after each page
+                self._mark_page_done(page)
+                known_run = self._update_known_run(page, known_counts, known_run)
+
+            # Checkpoint after every page
+            self.save_search_state()
+
+            if stop_after_known_pages and known_run >= stop_after_known_pages:
+                print(f"Stopping after {known_run} pages with only known patents")
+                break
+
+        # Update search state after completing all pages
+        self.search_state['has_more_pages'] = (self.search_state['last_page_processed'] < total_pages)
+        self.save_search_state()
+
+        # Convert to DataFrame
+        return self._patents_frame()
+
+    def search_parallel(self, query, search_column, sessions=4, max_pages=None, continue_from_last=True):
+        """
+        Perform a search with several independent search sessions. The result
+        pagination is tied to the session that submitted the search, so every
+        session submits the search itself and then retrieves a disjoint slice
+        of the pages. Pages are parsed and checkpointed one by one as they
+        arrive, so an interrupted search resumes with only the missing pages.
+
+        Args:
+            query (str): Search query (e.g. "petroleo brasileiro")
+            search_column (str): Column to search in (e.g. "NomeDepositante", "Titulo", etc.)
+            sessions (int): Number of search sessions retrieving pages at the same time
+            max_pages (int, optional): Maximum number of pages to scrape. If None, scrape all pages.
+            continue_from_last (bool): Whether to continue from the pages already processed
+
+        Returns:
+            DataFrame: Pandas DataFrame containing all scraped patent information
+        """
+        if not self.check_and_renew_session():
+            return None
+
+        if continue_from_last and self.search_state['last_query'] == query and self.search_state['last_search_column'] == search_column:
+            if not self.search_state['has_more_pages']:
+                print("All pages have already been processed. Skipping search query.")
+                return self._patents_frame()
+            print(f"Continuing search with {len(self._pages_done())} pages already processed")
+        else:
+            self._reset_search_state(query, search_column)
+
+        # Hits still waiting for their details are not queued twice when their page is parsed again
+        queued_ids = {patent.patent_id for patent in self.patents}
+
+        # The first page tells how many pages there are
+        total_pages = self.search_state['total_pages']
+        if 1 not in self._pages_done():
+            page_content = self._submit_search(query, search_column)
+            if page_content is None:
+                return None
+            self._save_page_content(page_content, page=1)
+            self.patents.extend(self._skip_queued(self._parse_page(page_content), queued_ids))
+            self._mark_page_done(1)
+            total_pages = self._read_total_pages(page_content)
+            self.save_search_state()
+
+        if max_pages is None:
+            max_pages = total_pages
+        else:
+            max_pages = min(max_pages, total_pages)
+
+        pages_done = self._pages_done()
+        pending = [page for page in range(2, max_pages + 1) if page not in pages_done]
+        # Interleave the slices so the checkpointed pages stay close to a contiguous prefix
+        slices = [pending[i::sessions] for i in range(sessions) if pending[i::sessions]]
+        if slices:
+            print(f"Retrieving {len(pending)} pages with {len(slices)} search sessions...")
+
+        results = queue.Queue()
+
+        def retrieve(pages):
+            """Submit the search on a new session and retrieve a slice of the pages"""
+            try:
+                session = self._create_search_session()
+                if self._submit_search(query, search_column, session=session) is None:
+                    return
+                for page in pages:
+                    page_content = self._fetch_result_page(page, session=session)
+                    if page_content is None:
+                        return
+                    results.put((page, page_content))
+            except Exception as e:
+                print(f"Search session failed: {e}")
+            finally:
+                results.put(None)
+
+        with ThreadPoolExecutor(max_workers=max(1, len(slices))) as executor:
+            for pages in slices:
+                executor.submit(retrieve, pages)
+
+            # Parse and checkpoint pages in the calling thread as they arrive
+            running = len(slices)
+            while running:
+                item = results.get()
+                if item is None:
+                    running -= 1
+                    continue
+                page, page_content = item
+                print(f"Scraping page {page} of {max_pages}")
+                self._save_page_content(page_content, page=page)
+                self.patents.extend(self._skip_queued(self._parse_page(page_content), queued_ids))
+                self._mark_page_done(page)
+                self.save_search_state()
+
+        missing = len(pending) - len(self._pages_done() & set(pending))
+        if missing:
+            print(f"{missing} pages could not be retrieved. Run the search again to resume them.")
+
+        self.search_state['has_more_pages'] = (self.search_state['last_page_processed'] < total_pages)
+        self.save_search_state()
+
+        return self._patents_frame()
+
+    def plan_partitions(self, query, search_column, start_date, end_date, max_pages=200):
+        """
+        Split a search into filing date ranges small enough to be walked in
+        full. A range with more than max_pages result pages is halved until
+        every range fits or is a single day. Every range is probed with one
+        advanced search on the main session, and the first page of each final
+        range is kept so it does not have to be requested again.
+
+        Args:
+            query (str): Search query (e.g. "petroleo brasileiro")
+            search_column (str): Column to search in (e.g. "NomeDepositante", "Titulo", etc.)
+            start_date (str): First filing date, as DD/MM/YYYY
+            end_date (str): Last filing date, as DD/MM/YYYY
+            max_pages (int): Largest number of result pages of a range
+
+        Returns:
+            list: Ranges in date order, as dictionaries with start, end,
+                  total_pages, total_results and first_page, or None if a
+                  probe failed
+        """
+        date_format = "%d/%m/%Y"
+        pending = [(datetime.strptime(start_date, date_format), datetime.strptime(end_date, date_format))]
+        partitions = []
+        while pending:
+            start, end = pending.pop()
+            filing_dates = (start.strftime(date_format), end.strftime(date_format))
+            page_content = self._submit_search(query, search_column, filing_dates=filing_dates)
+            if page_content is None:
+                return None
+
+            total_pages = self._count_result_pages(page_content)
+            if total_pages > max_pages and end > start:
+                # The earlier half is pushed last so ranges come out in date order
+                middle = start + (end - start) / 2
+                middle = datetime(middle.year, middle.month, middle.day)
+                pending.append((middle + timedelta(days=1), end))
+                pending.append((start, middle))
+                continue
+
+            if total_pages > max_pages:
+                print(f"Filing date {filing_dates[0]} alone has {total_pages} pages of results, "
+                      f"only {max_pages} will be retrieved")
+            print(f"  {filing_dates[0]} to {filing_dates[1]}: {total_pages} pages")
+            partitions.append({
+                'start': filing_dates[0],
+                'end': filing_dates[1],
+                'total_pages': total_pages,
+                'total_results': self._count_results(page_content),
+                'first_page': page_content,
+            })
+        return partitions
+
+    def search_partitioned(self, query, search_column, start_date, end_date, sessions=4, max_pages=200,
+                           continue_from_last=True):
+        """
+        Perform a search too large for a single result listing. The search is
+        split into filing date ranges by plan_partitions() and the ranges are
+        walked in parallel, each on a search session of its own. The patents
+        of all ranges are merged by patent ID, and the ranges are checked to
+        cover every result of the whole search.
+
+        Args:
+            query (str): Search query (e.g. "petroleo brasileiro")
+            search_column (str): Column to search in (e.g. "NomeDepositante", "Titulo", etc.)
+            start_date (str): First filing date, as DD/MM/YYYY
+            end_date (str): Last filing date, as DD/MM/YYYY
+            sessions (int): Number of search sessions walking ranges at the same time
+            max_pages (int): Largest number of result pages of a range
+            continue_from_last (bool): Whether to continue from the ranges and pages already processed
+
+        Returns:
+            DataFrame: Pandas DataFrame containing all scraped patent information
+        """
+        if not self.check_and_renew_session():
+            return None
+
+        seen = {}  # Range of every patent listed in this run
+        plan = self.search_state.get('partitions')
+        if continue_from_last and plan and self.search_state['last_query'] == query and self.search_state['last_search_column'] == search_column:
+            if not self.search_state['has_more_pages']:
+                print("All pages have already been processed. Skipping search query.")
+                return self._patents_frame()
+            print(f"Continuing partitioned search over {len(plan['ranges'])} filing date ranges")
+        else:
+            self._reset_search_state(query, search_column)
+
+            # The whole search tells how many patents the ranges must add up to
+            page_content = self._submit_search(query, search_column)
+            if page_content is None:
+                return None
+            total_results = self._count_results(page_content)
+
+            print(f"Splitting the search into filing date ranges of at most {max_pages} pages...")
+            ranges = self.plan_partitions(query, search_column, start_date, end_date, max_pages=max_pages)
+            if ranges is None:
+                return None
+            plan = {'total_results': total_results, 'max_pages': max_pages, 'ranges': ranges}
+            self.search_state['partitions'] = plan
+            for index, partition in enumerate(ranges):
+                first_page = partition.pop('first_page')
+                partition.update({'pages_done': [], 'found': 0})
+                self._process_partition_page(index, 1, first_page, seen)
+            self._update_partition_progress()
+            self.save_search_state()
+
+        ranges = plan['ranges']
+        work = queue.Queue()
+        for index, partition in enumerate(ranges):
+            pages = [page for page in range(2, min(partition['total_pages'], plan['max_pages']) + 1)
+                     if page not in partition['pages_done']]
+            if pages:
+                work.put((index, pages))
+        workers = min(sessions, work.qsize())
+        if workers:
+            print(f"Retrieving {work.qsize()} filing date ranges with {workers} search sessions...")
+
+        results = queue.Queue()
+
+        def retrieve():
+            """Walk ranges on a new session until none are left"""
+            try:
+                session = self._create_search_session()
+                while True:
+                    try:
+                        index, pages = work.get_nowait()
+                    except queue.Empty:
+                        return
+                    partition = ranges[index]
+                    filing_dates = (partition['start'], partition['end'])
+                    if self._submit_search(query, search_column, session=session, filing_dates=filing_dates) is None:
+                        return
+                    for page in pages:
+                        page_content = self._fetch_result_page(page, session=session)
+                        if page_content is None:
+                            return
+                        results.put((index, page, page_content))
+            except Exception as e:
+                print(f"Search session failed: {e}")
+            finally:
+                results.put(None)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for _ in range(workers):
+                executor.submit(retrieve)
+
+            # Parse and checkpoint pages in the calling thread as they arrive
+            running = workers
+            while running:
+                item = results.get()
+                if item is None:
+                    running -= 1
+                    continue
+                index, page, page_content = item
+                partition = ranges[index]
+                print(f"Scraping page {page} of {partition['total_pages']} of filing dates "
+                      f"{partition['start']} to {partition['end']}")
+                self._process_partition_page(index, page, page_content, seen)
+                self._update_partition_progress()
+                self.save_search_state()
+
+        # A patent listed by several ranges is only fetched once
+        self.patents = list({patent.patent_id: patent for patent in self.patents}.values())
+        self._check_partition_coverage(seen)
+        self.save_search_state()
+
+        return self._patents_frame()
+
+    @profiled_phase("search")
+    def _process_partition_page(self, index, page, page_content, seen):
+        """
+        Save and parse a result page of a filing date range of a partitioned search
+
+        Args:
+            index (int): Position of the range in the search plan
+            page (int): The page number within the range
+            page_content (str): HTML content of the page
+            seen (dict): Range index of every patent listed in this run, updated with the patents of the page
+        """
+        partition = self.search_state['partitions']['ranges'][index]
+        query = f"{self.search_state['last_query']} {partition['start']}-{partition['end']}"
+        self.page_cache.save_search_page(query, self.search_state['last_search_column'], page, page_content)
+
+        with self.metrics.timer('parse_seconds', page="search"):
+            hits = list(self._record_found(self.iter_patents(page_content)))
+        self.patents.extend(self._needs_details(hits))
+        for hit in hits:
+            seen.setdefault(hit.patent_id, set()).add(index)
+        partition['found'] += len(hits)
+        partition['pages_done'].append(page)
+
+    def _update_partition_progress(self):
+        """Summarize the progress of the ranges of a partitioned search in the search state"""
+        plan = self.search_state['partitions']
+        page_limits = [min(partition['total_pages'], plan['max_pages']) for partition in plan['ranges']]
+        pages_done = [len(partition['pages_done']) for partition in plan['ranges']]
+        self.search_state['total_pages'] = sum(page_limits)
+        self.search_state['last_page_processed'] = sum(pages_done)
+        self.search_state['has_more_pages'] = any(done < limit for done, limit in zip(pages_done, page_limits))
+
+    def _check_partition_coverage(self, seen):
+        """
+        Check that the filing date ranges of a partitioned search were walked
+        in full and together list every result of the whole search
+
+        Args:
+            seen (dict): Range indexes of every patent listed in this run
+
+        Returns:
+            bool: True if no gap or overlap was found
+        """
+        plan = self.search_state['partitions']
+        complete = True
+        for partition in plan['ranges']:
+            page_limit = min(partition['total_pages'], plan['max_pages'])
+            if len(partition['pages_done']) < page_limit:
+                print(f"Filing dates {partition['start']} to {partition['end']}: "
+                      f"{len(partition['pages_done'])} of {page_limit} pages retrieved")
+                complete = False
+            elif partition['total_results'] is not None and partition['found'] < partition['total_results']:
+                print(f"Filing dates {partition['start']} to {partition['end']}: "
+                      f"{partition['found']} of {partition['total_results']} patents listed")
+                complete = False
+
+        overlapping = sum(1 for indexes in seen.values() if len(indexes) > 1)
+        if overlapping:
+            print(f"{overlapping} patents were listed in more than one filing date range")
+            complete = False
+
+        found = sum(partition['found'] for partition in plan['ranges'])
+        total_results = plan['total_results']
+        if total_results is not None and found < total_results:
+            print(f"The filing date ranges list {found} of the {total_results} patents of the whole search. "
+                  f"The others have a filing date outside the ranges or were not retrieved.")
+            complete = False
+
+        if complete:
+            print(f"Coverage check passed: {found} patents in {len(plan['ranges'])} filing date ranges")
+        return complete
+
+    def _patents_frame(self):
+        """Return the patents that need details as a DataFrame"""
+        return pd.DataFrame([patent.to_dict() for patent in self.patents])
+
+    def _reset_search_state(self, query, search_column):
+        """
+        Start the search state of a new search, keeping the patents found so far
+
+        Args:
+            query (str): Search query
+            search_column (str): Column to search in
+        """
+        found_patents = self.search_state.get('found_patents', {})  # Keep existing patents
+        self.search_state = self._new_search_state()
+        self.search_state.update({
+            'last_query': query,
+            'last_search_column': search_column,
+            'found_patents': found_patents,
+        })
+        print(f"Starting new search for: {query} in column: {search_column}")
+
+    def _pages_done(self):
+        """
+        Return the result pages of the current search that were already processed
+
+        Returns:
+            set: Page numbers
+        """
+        # Search states written before per-page progress only record the contiguous prefix
+        return set(self.search_state.get('pages_done') or ()) | set(
+            range(1, self.search_state['last_page_processed'] + 1))
+
+    def _mark_page_done(self, page):
+        """
+        Record a processed result page and advance last_page_processed over
+        the contiguous prefix of processed pages
+
+        Args:
+            page (int): The page number
+        """
+        pages_done = self._pages_done()
+        pages_done.add(page)
+        last_page = self.search_state['last_page_processed']
+        while last_page + 1 in pages_done:
+            last_page += 1
+        self.search_state['last_page_processed'] = last_page
+        # Pages in the prefix are implied by last_page_processed
+        self.search_state['pages_done'] = sorted(p for p in pages_done if p > last_page)
+
+    @profiled_phase("search")
+    def _submit_search(self, query, search_column, session=None, filing_dates=None):
+        """
+        Submit the search form and return the first page of results
+
+        Args:
+            query (str): Search query
+            search_column (str): Column to search in
+            session (requests.Session, optional): Search session to use instead of self.session
+            filing_dates (tuple, optional): First and last filing dates as DD/MM/YYYY. If given, the
+                                            advanced search form is submitted instead of the basic one.
+
+        Returns:
+            str: HTML content of the first page, or None if the search failed
+        """
+        # Convert query to ISO-8859-1 encoding which appears to be used by the site
+        encoded_query = query
+        try:
+            # Try to encode as ISO-8859-1 if it's a standard string
+            if isinstance(query, str):
+                encoded_query = query.encode('iso-8859-1').decode('iso-8859-1')
+        except:
+            # If encoding fails, just use the original query
+            pass
+
+        form_data = {
+            'NumPedido': '',
+            'NumGru': '',
+            'NumProtocolo': '',
+            'FormaPesquisa': 'todasPalavras',
+            'ExpressaoPesquisa': encoded_query,
+            'Coluna': search_column,
+            'RegisterPerPage': '100',  # Increased to 100 results per page
+            'botao': ' pesquisar » ',
+            'Action': 'SearchBasico'
+        }
+        if filing_dates is not None:
+            form_data = dict(ADVANCED_SEARCH_FORM)
+            form_data[search_column] = encoded_query
+            form_data[FILING_DATE_FIELDS[0]], form_data[FILING_DATE_FIELDS[1]] = filing_dates
+
+        # Make the POST request
+        try:
+            response = self._request(
+                'POST',
+                self.base_url,
+                session=session,
+                data=form_data,
+                allow_redirects=True,
+                timeout=30,
+                endpoint="search"
+            )
+        except requests.exceptions.RequestException as e:
+            print(f"Failed to perform search: {e}")
+            return None
+
+        if response.status_code != 200:
+            print(f"Failed to perform search: {response.status_code}")
+            print(response.text[:500])  # Print first 500 chars to help debug
+            return None
+
+        # Check if we got a login page instead of search results
+        if self._is_session_login_page(response.text, session):
+            print("Session expired during search.")
+            return None
+
+        # Debug mode - open in browser if enabled
+        if self.debug:
+            self._debug_response(response, "search_results")
+
+        return response.text
+
+    @profiled_phase("search")
+    def _fetch_result_page(self, page, session=None):
         """
-        Save the current search state to a JSON file
+        Retrieve a page of results of the search submitted on a session
 
         Args:
-            filename (str): Name of the JSON file to save to
+            page (int): The page number
+            session (requests.Session, optional): Search session to use instead of self.session
+
+        Returns:
+            str: HTML content of the page, or None if it could not be retrieved
         """
-        filename = self.state_file
+        # For subsequent pages, we use the nextPage action with GET
+        next_params = {
+            'Action': 'nextPage',
+            'Page': page,
+            'Resumo': '',
+            'Titulo': ''
+        }
+
         try:
-            # Update last update time
-            self.search_state['last_update_time'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            response = self._request(
+                'GET',
+                self.base_url,
+                session=session,
+                params=next_params,
+                timeout=30,
+                endpoint="next_page"
+            )
+        except requests.exceptions.RequestException as e:
+            print(f"Failed to retrieve page {page}: {e}")
+            return None
 
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.search_state, f, ensure_ascii=False, indent=2)
-            print(f"Saved search state to {filename}")
-        except Exception as e:
-            print(f"Error saving search state: {e}")
+        if response.status_code != 200:
+            print(f"Failed to retrieve page {page}: {response.status_code}")
+            return None
 
-    def check_and_renew_session(self):
-        """
-        Check if the session has expired and renew it if necessary
+        # Check if we got a login page
+        if self._is_session_login_page(response.text, session):
+            print(f"Session expired while retrieving page {page}.")
+            return None
 
-        Returns:
-            bool: True if session is valid or was successfully renewed, False otherwise
-        """
-        if self.session_expired or not self.is_authenticated():
-            return False
-        return True
+        return response.text
 
-    def search(self, query, search_column, max_pages=None, continue_from_last=True):
+    def _is_session_login_page(self, html_content, session=None):
         """
-        Perform a search for patents with the given query
+        Check a response for a login page, updating the validity cache only
+        for responses of the main session
 
         Args:
-            query (str): Search query (e.g. "petroleo brasileiro")
-            search_column (str): Column to search in (e.g. "NomeDepositante", "Titulo", etc.)
-            max_pages (int, optional): Maximum number of pages to scrape. If None, scrape all pages.
-            continue_from_last (bool): Whether to continue from the last page processed
+            html_content (str): HTML content of the response
+            session (requests.Session, optional): Session the response came from
 
         Returns:
-            DataFrame: Pandas DataFrame containing all scraped patent information
+            bool: True if the response is a login page, False otherwise
         """
-        # Check if session is valid
-        if not self.check_and_renew_session():
-            return None
-
-        # Check if we should continue a previous search
-        start_page = 1
-        if continue_from_last and self.search_state['last_query'] == query and self.search_state['last_search_column'] == search_column:
-            # Continue from previous search regardless of has_more_pages
-            start_page = self.search_state['last_page_processed'] + 1
-            print(f"Continuing search from page {start_page}")
-
-            # If has_more_pages is False, we've already processed all pages
-            if not self.search_state['has_more_pages']:
-                print("All pages have already been processed. Skipping search query.")
-                return pd.DataFrame(self.patents)
-        else:
-            # Reset search state for new search
-            self.search_state = {
-                'last_query': query,
-                'last_search_column': search_column,
-                'last_page_processed': 0,
-                'total_pages': 0,
-                'has_more_pages': True,
-                'found_patents': self.search_state.get('found_patents', {}),  # Keep existing patents
-                'last_update_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-            print(f"Starting new search for: {query} in column: {search_column}")
-
-        # If we're starting a new search or starting from page 1
-        if start_page == 1:
-            # Initial search form data for POST request
-            # Convert query to ISO-8859-1 encoding which appears to be used by the site
-            encoded_query = query
-            try:
-                # Try to encode as ISO-8859-1 if it's a standard string
-                if isinstance(query, str):
-                    encoded_query = query.encode('iso-8859-1').decode('iso-8859-1')
-            except:
-                # If encoding fails, just use the original query
-                pass
-
-            form_data = {
-                'NumPedido': '',
-                'NumGru': '',
-                'NumProtocolo': '',
-                'FormaPesquisa': 'todasPalavras',
-                'ExpressaoPesquisa': encoded_query,
-                'Coluna': search_column,
-                'RegisterPerPage': '100',  # Increased to 100 results per page
-                'botao': ' pesquisar » ',
-                'Action': 'SearchBasico'
-            }
-
-            # Make the POST request
-            response = self.session.post(
-                self.base_url,
-                data=form_data,
-                allow_redirects=True
-            )
+        if session is None:
+            return self._track_session(html_content)
+        if self.is_login_page(html_content):
+            self.metrics.increment('session_expired_total')
+            return True
+        return False
 
-            if response.status_code != 200:
-                print(f"Failed to perform search: {response.status_code}")
-                print(response.text[:500])  # Print first 500 chars to help debug
-                return None
+    def _read_total_pages(self, page_content):
+        """
+        Read the number of result pages from the first page and store it in the search state
 
-            # Check if we got a login page instead of search results
-            if self.is_login_page(response.text):
-                print("Session expired during search.")
-                return None
+        Args:
+            page_content (str): HTML content of the first page of results
 
-            # Store the page content
-            page_content = response.text
+        Returns:
+            int: Number of result pages
+        """
+        total_pages = self._count_result_pages(page_content)
+        print(f"Found {total_pages} pages of results")
+        self.search_state['total_pages'] = total_pages
+        return total_pages
 
-            # Debug mode - open in browser if enabled
-            if self.debug:
-                self._debug_response(response, "search_results")
+    def _count_result_pages(self, page_content):
+        """
+        Read the number of result pages from the first page of results
 
-            # Parse first page
-            self._parse_page(page_content)
+        Args:
+            page_content (str): HTML content of the first page of results
 
-            # Update search state - first page is processed
-            self.search_state['last_page_processed'] = 1
+        Returns:
+            int: Number of result pages
+        """
+        soup = self._make_soup(page_content)
+        for text in soup.select("font.normal"):
+            match = re.search(r'Mostrando página \<b\>(\d+)\<\/b\> de \<b\>(\d+)\<\/b\>', str(text))
+            if match:
+                return int(match.group(2))
+        return 1
+
+    def _count_results(self, page_content):
+        """
+        Read the number of patents a search found from its first page of results
 
-            # Save the page content as HTML
-            self._save_page_content(page_content, page=1)
+        Args:
+            page_content (str): HTML content of the first page of results
 
-            # Get total number of pages
-            soup = BeautifulSoup(page_content, 'html.parser')
-            pagination_text = soup.select("font.normal")
+        Returns:
+            int: Number of patents, or None if the page does not show it
+        """
+        match = re.search(r'Foram encontrados\s*(?:<b>)?\s*([\d.]+)', page_content)
+        return int(match.group(1).replace('.', '')) if match else None
 
-            total_pages = 1
-            for text in pagination_text:
-                match = re.search(r'Mostrando página \<b\>(\d+)\<\/b\> de \<b\>(\d+)\<\/b\>', str(text))
-                if match:
-                    total_pages = int(match.group(2))
-                    print(f"Found {total_pages} pages of results")
-                    self.search_state['total_pages'] = total_pages
-                    break
-        else:
-            # We're continuing from a previous search
-            total_pages = self.search_state['total_pages']
+    @profiled_phase("auth")
+    def _create_search_session(self):
+        """
+        Create a session with its own server-side search state. The site keeps
+        the result pagination per JSESSIONID, so that cookie is not copied and
+        the new session asks the login controller for one of its own.
 
-        # Set max_pages if not specified
-        if max_pages is None:
-            max_pages = total_pages
-        else:
-            max_pages = min(max_pages, total_pages)
+        Returns:
+            requests.Session: The new session
+        """
+        session = requests.Session()
+        for cookie in self.session.cookies:
+            if cookie.name != 'JSESSIONID':
+                session.cookies.set_cookie(cookie)
 
-        # Scrape remaining pages
-        for page in range(start_page, max_pages + 1):
-            if page > 1:  # Skip page 1 if we're starting a new search (already processed above)
-                print(f"Scraping page {page} of {max_pages}")
+        self._request('GET', self.login_url, session=session, params={'action': 'login'}, timeout=30, endpoint="login")
+        return session
 
-                # For subsequent pages, we use the nextPage action with GET
-                next_params = {
-                    'Action': 'nextPage',
-                    'Page': page,
-                    'Resumo': '',
-                    'Titulo': ''
-                }
+    def search_batch(self, jobs, state_file_for, max_pages=None, sessions=1):
+        """
+        Run several searches over the same session and merge their results,
+        so a patent matched by many queries is only fetched once
 
-                # Add a delay to be polite to the server
-                time.sleep(1.0)  # random.uniform(1.0, 3.0))
+        Args:
+            jobs (list): List of (search_column, query) pairs
+            state_file_for (callable): Returns the state file name of a (search_column, query) pair
+            max_pages (int, optional): Maximum number of pages to scrape per query. If None, scrape all pages.
+            sessions (int): Number of search sessions retrieving the pages of each query at the same time
 
-                # Check if session is still valid
-                if not self.check_and_renew_session():
-                    print("Failed to maintain session. Saving progress and exiting.")
-                    self.search_state['last_page_processed'] = page - 1
-                    self.search_state['has_more_pages'] = True
-                    self.save_search_state()
-                    break
+        Returns:
+            DataFrame: Pandas DataFrame containing the distinct patents that need details
+        """
+        # Patents imported by load_existing_data() still need details
+        patents_by_id = {patent.patent_id: replace(patent) for patent in self.patents}
+        self.query_matches = {}
 
-                response = self.session.get(
-                    self.base_url,
-                    params=next_params
-                )
+        for search_column, query in jobs:
+            print(f"\n=== Batch query: {query} in column: {search_column} ===")
+            self._start_batch_job(search_column, query, state_file_for(search_column, query))
 
-                if response.status_code != 200:
-                    print(f"Failed to retrieve page {page}: {response.status_code}")
-                    # Update search state to indicate where we stopped
-                    self.search_state['last_page_processed'] = page - 1
-                    self.search_state['has_more_pages'] = True
-                    self.save_search_state()
-                    break
+            if sessions > 1:
+                results = self.search_parallel(query, search_column=search_column, sessions=sessions,
+                                               max_pages=max_pages, continue_from_last=True)
+            else:
+                results = self.search(query, search_column=search_column, max_pages=max_pages, continue_from_last=True)
+            if results is None:
+                print(f"Search failed for {query} in column: {search_column}")
+            self.save_search_state(compact=True)
 
-                # Check if we got a login page
-                if self.is_login_page(response.text):
-                    print(f"Session expired while retrieving page {page}.")
-                    self.search_state['last_page_processed'] = page - 1
-                    self.search_state['has_more_pages'] = True
-                    self.save_search_state()
-                    break
+            # Record every patent the query matched, including the ones found in earlier runs
+            label = f"{search_column}:{query}"
+            matched_ids = list(self.search_state['found_patents']) + [patent.patent_id for patent in self.patents]
+            for patent_id in dict.fromkeys(matched_ids):
+                self.query_matches.setdefault(patent_id, []).append(label)
 
-                # Store the page content
-                page_content = response.text
+            for patent in self.patents:
+                patents_by_id.setdefault(patent.patent_id, replace(patent))
 
-                # Save the page content as HTML
-                self._save_page_content(page_content, page=page)
+        for patent_id, patent in patents_by_id.items():
+            patent.matched_queries = self.query_matches.get(patent_id, [])
 
-                # Parse the page
-                self._parse_page(page_content)
+        self.patents = list(patents_by_id.values())
+        print(f"\nBatch matched {len(self.query_matches)} distinct patents, {len(self.patents)} need details")
+        return self._patents_frame()
 
-                # Update search state after each page
-                self.search_state['last_page_processed'] = page
+    def _start_batch_job(self, search_column, query, state_file):
+        """
+        Switch the search state to another query of a batch
 
-            # Save search state periodically (every 5 pages)
-            if page % 5 == 0 or page == max_pages:
-                self.save_search_state()
+        Args:
+            search_column (str): Column of the query
+            query (str): The query
+            state_file (str): Name of the JSON file containing the search state of the query
+        """
+        self.state_file = state_file
+        self.search_state = self._new_search_state()
+        self.unsaved_found_ids = []
+        self.journal_entries = 0
+        self.patents = []
 
-        # Update search state after completing all pages
-        self.search_state['has_more_pages'] = (self.search_state['last_page_processed'] < total_pages)
-        self.save_search_state()
+        if self.store is not None:
+            search_state = self.store.load_search_state(query, search_column)
+            if search_state:
+                self.search_state = search_state
+        else:
+            self._load_search_state(state_file)
 
-        # Filter out already processed patents that have details
-        if self.processed_patent_ids:
-            original_count = len(self.patents)
-            self.patents = [p for p in self.patents if p['patent_id'] not in self.processed_patent_ids or
-                            (p['patent_id'] in self.csv_patents_dict and not self.csv_patents_dict[p['patent_id']].get('has_details', False))]
-            print(f"Filtered out {original_count - len(self.patents)} already processed patents with details")
+    def save_query_matches(self, filename):
+        """
+        Save which batch queries matched each patent, merged with the matches of earlier runs
 
-        # Convert to DataFrame
-        return pd.DataFrame(self.patents)
+        Args:
+            filename (str): Name of the CSV file
+        """
+        rows = [{'patent_id': patent_id, 'query': label}
+                for patent_id, labels in self.query_matches.items() for label in labels]
+        df = pd.DataFrame(rows, columns=['patent_id', 'query'])
+        if os.path.exists(filename):
+            df = pd.concat([pd.read_csv(filename, dtype=str), df], ignore_index=True).drop_duplicates()
+        df.to_csv(filename, index=False, encoding='utf-8')
+        print(f"Saved {len(df)} query matches to {filename}")
 
     def is_login_page(self, html_content):
         """
@@ -411,19 +2545,8 @@ class INPIPatentScraper:
             html_content (str): The HTML content to save
             page (int): The page number
         """
-        # Create cache directory if it doesn't exist
-        cache_dir = "inpi_cache"
-        if not os.path.exists(cache_dir):
-            os.makedirs(cache_dir)
-
-        # Generate a filename based on query, page, and date
         query = self.search_state['last_query'] or "unknown"
-        query_hash = hashlib.md5(query.encode()).hexdigest()[:8]
-        filename = f"{cache_dir}/search_{query_hash}_page_{page}.html"
-
-        # Save the HTML content
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        self.page_cache.save_search_page(query, self.search_state['last_search_column'] or '', page, html_content)
 
     def _remove_line_breaks(self, text):
         """
@@ -448,35 +2571,55 @@ class INPIPatentScraper:
 
         return text
 
-    def _parse_page(self, html_content):
+    @profiled_phase("search")
+    def _parse_page(self, html_content, known_ids=None, known_counts=None):
         """
-        Parse the HTML content of a page and extract patent information
+        Parse a page of search results, record its patents in the search state
+        and return the ones that still need details
 
         Args:
             html_content (str): HTML content of the page
+            known_ids (set, optional): IDs of the patents known before the search
+            known_counts (dict, optional): Filled with the number of patents on the page and how many are in known_ids
+
+        Returns:
+            list: PatentHit records that need details
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
+        with self.metrics.timer('parse_seconds', page="search"):
+            patents = self.iter_patents(html_content)
+            if known_ids is not None:
+                patents = self._count_known(patents, known_ids, known_counts)
+            return list(self._needs_details(self._record_found(patents)))
 
-        # Find the table containing the patent rows
-        table_rows = soup.select("tbody#tituloContext tr")
+    def iter_patents(self, markup):
+        """
+        Parse a page of search results without touching the scraper state
+
+        Args:
+            markup (str or file): HTML content of the page, or an open file containing it
+
+        Yields:
+            PatentHit: Patent information of each result row
+        """
+        soup = self._make_soup(markup)
 
-        for row in table_rows:
+        # Find the table containing the patent rows
+        for row in soup.select("tbody#tituloContext tr"):
             try:
                 # Extract the patent data
-                patent_number = row.select_one("td:nth-of-type(2) a").text.strip()
+                patent_link = row.select_one("td:nth-of-type(2) a")
+                patent_number = patent_link.text.strip()
                 filing_date = row.select_one("td:nth-of-type(3) font").text.strip()
 
                 # Get the patent ID for later use in fetching details
-                patent_link = row.select_one("td:nth-of-type(2) a")['href']
-                patent_id_match = re.search(r'CodPedido=(\d+)', patent_link)
-                patent_id = patent_id_match.group(1) if patent_id_match else None
+                patent_id_match = re.search(r'CodPedido=(\d+)', patent_link['href'])
 
                 # Skip if no patent ID found
-                if not patent_id:
+                if not patent_id_match:
                     continue
 
                 # Extract search parameters from the URL for detail page access
-                search_param_match = re.search(r'SearchParameter=([^&]+)', patent_link)
+                search_param_match = re.search(r'SearchParameter=([^&]+)', patent_link['href'])
                 search_param = search_param_match.group(1) if search_param_match else ''
 
                 # Try to extract title if present
@@ -492,37 +2635,108 @@ class INPIPatentScraper:
                 # Extract the patent_number_raw (for creating detail URLs)
                 patent_number_raw = re.sub(r'[^\d]', '', patent_number)
 
-                # Create patent data dictionary
-                patent_data = {
-                    'patent_number': patent_number,
-                    'filing_date': filing_date,
-                    'patent_id': patent_id,
-                    'title': title,
-                    'ipc': ipc,
-                    'patent_number_raw': patent_number_raw,
-                    'search_param': search_param
-                }
-
-                # Store in search state
-                self.search_state['found_patents'][patent_id] = patent_data
-
-                # Check if we should process this patent
-                # We process if:
-                # 1. It's not in the processed list, OR
-                # 2. It's in the CSV but doesn't have details
-                should_process = (
-                    patent_id not in self.processed_patent_ids or
-                    (patent_id in self.csv_patents_dict and not self.csv_patents_dict[patent_id].get('has_details', False))
+                yield PatentHit(
+                    patent_number=patent_number,
+                    filing_date=filing_date,
+                    patent_id=patent_id_match.group(1),
+                    title=title,
+                    ipc=ipc,
+                    patent_number_raw=patent_number_raw,
+                    search_param=search_param
                 )
 
-                if should_process:
-                    # Add to our list for further processing
-                    self.patents.append(patent_data)
-
             except Exception as e:
                 print(f"Error parsing row: {e}")
 
-    def get_patent_details(self, patent_id, search_param='', resumo='', titulo=''):
+    def _count_known(self, patents, known_ids, known_counts):
+        """
+        Pipeline stage counting the patents of a page that were already known
+
+        Args:
+            patents (iterable): PatentHit records from iter_patents()
+            known_ids (set): IDs of the patents known before the search
+            known_counts (dict): Updated with the 'total' and 'known' counts
+
+        Yields:
+            PatentHit: The same records
+        """
+        known_counts.setdefault('total', 0)
+        known_counts.setdefault('known', 0)
+        for patent_data in patents:
+            known_counts['total'] += 1
+            if patent_data.patent_id in known_ids:
+                known_counts['known'] += 1
+            yield patent_data
+
+    def _skip_queued(self, patents, queued_ids):
+        """
+        Pipeline stage dropping the patents that are already queued for details
+
+        Args:
+            patents (iterable): PatentHit records from _parse_page()
+            queued_ids (set): IDs of the queued patents, updated with the new ones
+
+        Yields:
+            PatentHit: The records not queued yet
+        """
+        for patent_data in patents:
+            if patent_data.patent_id not in queued_ids:
+                queued_ids.add(patent_data.patent_id)
+                yield patent_data
+
+    def _update_known_run(self, page, known_counts, known_run):
+        """
+        Report the share of known patents on a page of an incremental crawl
+        and update the number of consecutive fully known pages
+
+        Args:
+            page (int): The page number
+            known_counts (dict): Counts filled by _count_known(), empty outside incremental crawls
+            known_run (int): Number of fully known pages right before this one
+
+        Returns:
+            int: Number of fully known pages ending with this one
+        """
+        if not known_counts:
+            return known_run
+        total = known_counts['total']
+        known = known_counts['known']
+        print(f"Page {page}: {known} of {total} patents already known")
+        return known_run + 1 if total and known == total else 0
+
+    def _record_found(self, patents):
+        """
+        Pipeline stage storing every patent found in the search results in the search state
+
+        Args:
+            patents (iterable): PatentHit records from iter_patents()
+
+        Yields:
+            PatentHit: The same records
+        """
+        for patent_data in patents:
+            self._record_found_patent(patent_data)
+            yield patent_data
+
+    def _needs_details(self, patents):
+        """
+        Pipeline stage keeping the patents that still need details: the ones
+        not processed yet and the ones saved without details
+
+        Args:
+            patents (iterable): PatentHit records from iter_patents()
+
+        Yields:
+            PatentHit: Records that need details
+        """
+        for patent_data in patents:
+            patent_id = patent_data.patent_id
+            if patent_id not in self.processed_patent_ids or self._is_missing_details(patent_id):
+                yield patent_data
+
+    @profiled_phase("detail_fetch")
+    def get_patent_details(self, patent_id, search_param='', resumo='', titulo='', session=None, rate_limited=True,
+                           use_cache=True):
         """
         Get the details for a specific patent
 
@@ -531,11 +2745,18 @@ class INPIPatentScraper:
             search_param (str): Search parameter from the original search
             resumo (str): Resumo parameter from the original search
             titulo (str): Titulo parameter from the original search
-            max_retries (int): Maximum number of retries if session expires
+            session (requests.Session, optional): Session to use instead of self.session
+            rate_limited (bool): Whether to wait for the rate limiter before requesting the page
+            use_cache (bool): Whether a fresh cached page may be used instead of requesting the page
 
         Returns:
-            dict: Dictionary containing the patent details or None if failed
+            PatentDetails: The patent details or None if failed
         """
+        # Serve the page from the cache if it is still fresh
+        cached_details = self._load_cached_detail(patent_id) if use_cache else None
+        if cached_details is not None:
+            return cached_details
+
         # Check if session is valid
         if not self.check_and_renew_session():
             print('Session is not authenticated')
@@ -551,23 +2772,25 @@ class INPIPatentScraper:
 
         try:
             try:
-                response = self.session.get(
+                response = self._request(
+                    'GET',
                     self.base_url,
+                    session=session,
+                    rate_limited=rate_limited,
                     params=params,
-                    timeout=10
+                    timeout=10,
+                    endpoint="detail"
                 )
             except requests.exceptions.Timeout:
                 print(f"Request timed out for patent {patent_id}, returning partial info")
-                return {
-                    'patent_id': patent_id,
-                }
+                return PatentDetails(patent_id=patent_id)
 
             if response.status_code != 200:
                 print(f"Failed to retrieve patent details: {response.status_code}")
                 return None
 
             # Check if we got a login page
-            if self.is_login_page(response.text):
+            if self._track_session(response.text):
                 print(f"Session expired while retrieving details for patent {patent_id}.")
                 return None
 
@@ -582,16 +2805,50 @@ class INPIPatentScraper:
                 self._debug_response(response, f"detail_{patent_id}")
 
             # Parse the details page
-            parse_detail = self._parse_detail_page(detail_content)
-            if parse_detail == {}:
+            parse_detail = self._parse_detail_page_memo(detail_content)
+            if not parse_detail:
                 print('Parse detail page returned empty')
-            return self._parse_detail_page(detail_content)
+                return parse_detail
+            self._update_site_date(parse_detail.get('last_update_date'))
+            return replace(parse_detail, fetched_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
 
         except Exception as e:
             print(f"Error retrieving patent details for {patent_id}: {e}")
             print(f"Could not retrieve patent details for {patent_id}.")
             return None
 
+    def _parse_detail_page_memo(self, html_content):
+        """
+        Parse the details page HTML content, reusing the result of an earlier
+        parse of the exact same content
+
+        Args:
+            html_content (str): HTML content of the detail page
+
+        Returns:
+            PatentDetails: The patent details, shared with earlier callers that parsed the same content
+        """
+        content_hash = hashlib.sha1(html_content.encode('utf-8')).hexdigest()
+
+        with self.parse_memo_lock:
+            details = self.parse_memo.get(content_hash)
+            if details is not None:
+                self.parse_memo.move_to_end(content_hash)
+                self.parse_stats['memo_hits'] += 1
+                return details
+
+        with self.metrics.timer('parse_seconds', page="detail"):
+            details = self._parse_detail_page(html_content)
+
+        with self.parse_memo_lock:
+            self.parse_stats['parsed'] += 1
+            if self.parse_memo_size:
+                self.parse_memo[content_hash] = details
+                if len(self.parse_memo) > self.parse_memo_size:
+                    self.parse_memo.popitem(last=False)
+        return details
+
+    @profiled_phase("detail_parse")
     def _parse_detail_page(self, html_content):
         """
         Parse the details page HTML content
@@ -600,45 +2857,29 @@ class INPIPatentScraper:
             html_content (str): HTML content of the detail page
 
         Returns:
-            dict: Dictionary containing the patent details
+            PatentDetails: The patent details
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = self._make_soup(html_content)
+
+        # Walk the document once and collect every element the fields are read from
+        page = self._scan_detail_page(soup)
 
         # Extract details from the detail page
         details = {}
 
         # Extract patent number (código de pedido BR XX XXXX XXXXXX X)
-        patent_number_elem = soup.select_one("font.marcador")
+        patent_number_elem = page['patent_number']
         if patent_number_elem:
             details['patent_number_full'] = self._remove_line_breaks(patent_number_elem.text.strip())
 
-        # Extract filing date (data do depósito)
-        filing_date_row = soup.find("font", string=lambda text: text and "Data do Depósito:" in text)
-        if filing_date_row:
-            filing_date_elem = filing_date_row.find_next("font", class_="normal")
-            if filing_date_elem:
-                details['filing_date_detail'] = self._remove_line_breaks(filing_date_elem.text.strip())
-
-        # Extract publication date if available
-        pub_date_row = soup.find("font", string=lambda text: text and "Data da Publicação:" in text)
-        if pub_date_row:
-            pub_date_elem = pub_date_row.find_next("font", class_="normal")
-            if pub_date_elem:
-                pub_date = pub_date_elem.text.strip().replace('-', '').strip()
-                details['publication_date'] = self._remove_line_breaks(pub_date) if pub_date else None
-
-        # Extract grant date if available
-        grant_date_row = soup.find("font", string=lambda text: text and "Data da Concessão:" in text)
-        if grant_date_row:
-            grant_date_elem = grant_date_row.find_next("font", class_="normal")
-            if grant_date_elem:
-                grant_date = grant_date_elem.text.strip().replace('-', '').strip()
-                details['grant_date'] = self._remove_line_breaks(grant_date) if grant_date else None
+        # Extract filing, publication and grant dates
+        for field in ('filing_date_detail', 'publication_date', 'grant_date'):
+            if field in page['fields']:
+                details[field] = page['fields'][field]
 
         # Extract IPC classifications if available
-        ipc_rows = soup.find_all("a", href="javascript:void(0)", onmouseout=lambda x: x and "hideMe('classificacao" in x)
         ipc_codes = []
-        for i, row in enumerate(ipc_rows):
+        for row in page['ipc_links']:
             if 'normal' in row.get('class', []) and row.text.strip():
                 ipc_codes.append(self._remove_line_breaks(row.text.strip()))
 
@@ -646,47 +2887,27 @@ class INPIPatentScraper:
             details['ipc_codes'] = ipc_codes
 
         # Extract title
-        title_context = soup.select_one("div#tituloContext")
+        title_context = page['title']
         if title_context:
             title_text = title_context.get_text(strip=True)
             if title_text:
                 details['title'] = self._remove_line_breaks(title_text)
 
         # Extract abstract
-        abstract_context = soup.select_one("div#resumoContext")
+        abstract_context = page['abstract']
         if abstract_context:
             abstract_text = abstract_context.get_text(strip=True)
             if abstract_text:
                 details['abstract'] = self._remove_line_breaks(abstract_text)
 
-        # Extract applicants (depositantes)
-        applicant_row = soup.find("font", string=lambda text: text and "Nome do Depositante:" in text)
-        if applicant_row:
-            applicant_elem = applicant_row.find_next("font", class_="normal")
-            if applicant_elem:
-                applicants_text = applicant_elem.text.strip()
-                details['applicants'] = [self._remove_line_breaks(app.strip()) for app in applicants_text.split('/')]
-                details['applicants_raw'] = self._remove_line_breaks(applicants_text)
-
-        # Extract inventors if available
-        inventor_row = soup.find("font", string=lambda text: text and "Nome do Inventor:" in text)
-        if inventor_row:
-            inventor_elem = inventor_row.find_next("font", class_="normal")
-            if inventor_elem:
-                inventors_text = inventor_elem.text.strip()
-                details['inventors'] = [self._remove_line_breaks(inv.strip()) for inv in inventors_text.split('/')]
-                details['inventors_raw'] = self._remove_line_breaks(inventors_text)
-
-        # Extract patent agent if available
-        agent_row = soup.find("font", string=lambda text: text and "Nome do Procurador:" in text)
-        if agent_row:
-            agent_elem = agent_row.find_next("font", class_="normal")
-            if agent_elem:
-                details['patent_agent'] = self._remove_line_breaks(agent_elem.text.strip())
+        # Extract applicants, inventors and patent agent if available
+        for field in ('applicants', 'applicants_raw', 'inventors', 'inventors_raw', 'patent_agent'):
+            if field in page['fields']:
+                details[field] = page['fields'][field]
 
         # Extract publications/despachos (office actions)
         publications = []
-        pub_table = soup.select_one("div.accordion-item input#accordion-3 + label + div.accordion-content table")
+        pub_table = page['accordions'].get(3)
         if pub_table:
             pub_rows = pub_table.select("tr.normal")
             for row in pub_rows:
@@ -713,7 +2934,7 @@ class INPIPatentScraper:
 
         # Extract petitions (petições)
         petitions = []
-        pet_table = soup.select_one("div.accordion-item input#accordion-1 + label + div.accordion-content table")
+        pet_table = page['accordions'].get(1)
         if pet_table:
             petition_sections = pet_table.find_all("font", class_="titulo", string=lambda x: x and x.strip() in ["Serviços", "Anuidade", "Outros"])
             for section in petition_sections:
@@ -750,30 +2971,244 @@ class INPIPatentScraper:
         if petitions:
             details['petitions_json'] = json.dumps(petitions, ensure_ascii=False)
 
-        # Extract anuidades (fees)
-        anuidades = {}
-        anuidade_table = soup.select_one("div.accordion-item input#accordion-2 + label + div.accordion-content table")
-        if anuidade_table:
-            # Get the status of anuidades (fees) using the images
-            anuidade_imgs = anuidade_table.select("a[href*='javascript:void(0)'] img[alt*='Anuidade']")
-            for img in anuidade_imgs:
-                if img.find_previous("font", class_="normal"):
-                    anuidade_num = img.find_previous("font", class_="normal").text.strip()
-                    anuidade_status = "Paga" if "Averbada" in img.get("alt", "") else "Não Paga"
-                    anuidade_num = anuidade_num.split("ª")[0] if "ª" in anuidade_num else anuidade_num
-                    anuidades[f"anuidade_{anuidade_num}"] = anuidade_status
+        # Extract anuidades (fees)
+        anuidades = {}
+        anuidade_table = page['accordions'].get(2)
+        if anuidade_table:
+            # Get the status of anuidades (fees) using the images
+            anuidade_imgs = anuidade_table.select("a[href*='javascript:void(0)'] img[alt*='Anuidade']")
+            for img in anuidade_imgs:
+                if img.find_previous("font", class_="normal"):
+                    anuidade_num = img.find_previous("font", class_="normal").text.strip()
+                    anuidade_status = "Paga" if "Averbada" in img.get("alt", "") else "Não Paga"
+                    anuidade_num = anuidade_num.split("ª")[0] if "ª" in anuidade_num else anuidade_num
+                    anuidades[f"anuidade_{anuidade_num}"] = anuidade_status
+
+        if anuidades:
+            details['anuidades_json'] = json.dumps(anuidades, ensure_ascii=False)
+
+        # Extract last update date
+        # The date is in a <b> next to the label text, so match on the element holding the text
+        update_date_text = page['update_date_text']
+        if update_date_text:
+            date_match = re.search(r'atualizados até\s*(?:<b>)?\s*(\d{2}/\d{2}/\d{4})', str(update_date_text.parent))
+            if date_match:
+                details['last_update_date'] = self._remove_line_breaks(date_match.group(1))
+
+        return PatentDetails(**details)
+
+    def _scan_detail_page(self, soup):
+        """
+        Walk a detail page once and collect the elements the details are read from.
+        Labeled fields are dispatched through DETAIL_LABEL_HANDLERS: the value of
+        a label is the first "normal" font that follows it in the document.
+
+        Args:
+            soup (BeautifulSoup): Parsed detail page
+
+        Returns:
+            dict: Elements found on the page, and the labeled fields already extracted
+        """
+        page = {
+            'patent_number': None,
+            'title': None,
+            'abstract': None,
+            'ipc_links': [],
+            'accordion_inputs': {},
+            'update_date_text': None,
+            'fields': {},
+        }
+        pending_handlers = []
+        remaining_labels = list(DETAIL_LABEL_HANDLERS)
+
+        for node in soup.descendants:
+            if isinstance(node, NavigableString):
+                if page['update_date_text'] is None and "Dados atualizados até" in node:
+                    page['update_date_text'] = node
+                continue
+
+            if node.name == 'font':
+                classes = node.get('class', [])
+                if pending_handlers and 'normal' in classes:
+                    for handler in pending_handlers:
+                        handler(self, page['fields'], node)
+                    pending_handlers = []
+
+                if page['patent_number'] is None and 'marcador' in classes:
+                    page['patent_number'] = node
+
+                text = node.string if remaining_labels else None
+                if text:
+                    for label, handler in list(remaining_labels):
+                        if label in text:
+                            remaining_labels.remove((label, handler))
+                            pending_handlers.append(handler)
+
+            elif node.name == 'a':
+                onmouseout = node.get('onmouseout')
+                if node.get('href') == "javascript:void(0)" and onmouseout and "hideMe('classificacao" in onmouseout:
+                    page['ipc_links'].append(node)
+
+            elif node.name == 'div':
+                element_id = node.get('id')
+                if element_id == 'tituloContext' and page['title'] is None:
+                    page['title'] = node
+                elif element_id == 'resumoContext' and page['abstract'] is None:
+                    page['abstract'] = node
+
+            elif node.name == 'input':
+                match = re.fullmatch(r'accordion-(\d+)', node.get('id') or '')
+                if match:
+                    page['accordion_inputs'].setdefault(int(match.group(1)), []).append(node)
+
+        # Same as "div.accordion-item input#accordion-N + label + div.accordion-content table"
+        page['accordions'] = {}
+        for number, inputs in page.pop('accordion_inputs').items():
+            for accordion_input in inputs:
+                table = self._accordion_table(accordion_input)
+                if table:
+                    page['accordions'][number] = table
+                    break
+
+        return page
+
+    def _accordion_table(self, accordion_input):
+        """
+        Find the table of an accordion section from its checkbox input
+
+        Args:
+            accordion_input (Tag): The input#accordion-N element
+
+        Returns:
+            Tag: The table inside the accordion content, or None
+        """
+        if not accordion_input.find_parent("div", class_="accordion-item"):
+            return None
+        label = accordion_input.find_next_sibling()
+        if label is None or label.name != 'label':
+            return None
+        content = label.find_next_sibling()
+        if content is None or content.name != 'div' or 'accordion-content' not in content.get('class', []):
+            return None
+        return content.find("table")
+
+    def _handle_filing_date(self, fields, elem):
+        """Extract filing date (data do depósito)"""
+        fields['filing_date_detail'] = self._remove_line_breaks(elem.text.strip())
+
+    def _handle_publication_date(self, fields, elem):
+        """Extract publication date if available"""
+        pub_date = elem.text.strip().replace('-', '').strip()
+        fields['publication_date'] = self._remove_line_breaks(pub_date) if pub_date else None
+
+    def _handle_grant_date(self, fields, elem):
+        """Extract grant date if available"""
+        grant_date = elem.text.strip().replace('-', '').strip()
+        fields['grant_date'] = self._remove_line_breaks(grant_date) if grant_date else None
+
+    def _handle_applicants(self, fields, elem):
+        """Extract applicants (depositantes)"""
+        applicants_text = elem.text.strip()
+        fields['applicants'] = [self._remove_line_breaks(app.strip()) for app in applicants_text.split('/')]
+        fields['applicants_raw'] = self._remove_line_breaks(applicants_text)
+
+    def _handle_inventors(self, fields, elem):
+        """Extract inventors if available"""
+        inventors_text = elem.text.strip()
+        fields['inventors'] = [self._remove_line_breaks(inv.strip()) for inv in inventors_text.split('/')]
+        fields['inventors_raw'] = self._remove_line_breaks(inventors_text)
+
+    def _handle_patent_agent(self, fields, elem):
+        """Extract patent agent if available"""
+        fields['patent_agent'] = self._remove_line_breaks(elem.text.strip())
+
+    def _parse_update_date(self, date_text):
+        """
+        Parse a "Dados atualizados até" date
+
+        Args:
+            date_text (str): Date in DD/MM/YYYY format
+
+        Returns:
+            datetime: The parsed date, or None if it is missing or invalid
+        """
+        try:
+            return datetime.strptime(date_text, "%d/%m/%Y")
+        except (TypeError, ValueError):
+            return None
+
+    def _update_site_date(self, date_text):
+        """
+        Remember the most recent update date seen on a page fetched from the site
+
+        Args:
+            date_text (str): The last_update_date of a freshly fetched detail page
+        """
+        update_date = self._parse_update_date(date_text)
+        if update_date and (self.site_update_date is None or update_date > self.site_update_date):
+            self.site_update_date = update_date
+
+    def _load_cached_detail(self, patent_id):
+        """
+        Parse the cached detail page of a patent if it is still fresh
+
+        Args:
+            patent_id (str): The patent ID
+
+        Returns:
+            PatentDetails: The patent details, or None if the page is not
+                           cached or is stale
+        """
+        if not self.use_detail_cache:
+            return None
+
+        filename = self.page_cache.find_detail(patent_id)
+        if filename is None:
+            self._count_cache_lookup('misses', "miss")
+            return None
+
+        age = time.time() - os.path.getmtime(filename)
+        fresh = self.detail_cache_max_age is not None and age < self.detail_cache_max_age
+
+        details = None
+        if not fresh and self.site_update_date is not None:
+            details = self._parse_detail_page_memo(read_cached_page(filename))
+            cached_date = self._parse_update_date(details.get('last_update_date'))
+            fresh = cached_date is not None and cached_date >= self.site_update_date
+
+        if not fresh:
+            self._count_cache_lookup('stale', "stale")
+            return None
+
+        if details is None:
+            details = self._parse_detail_page_memo(read_cached_page(filename))
+
+        if not details:
+            self._count_cache_lookup('stale', "stale")
+            return None
+
+        self._count_cache_lookup('hits', "hit")
+        fetched_at = datetime.fromtimestamp(os.path.getmtime(filename)).strftime("%Y-%m-%d %H:%M:%S")
+        return replace(details, fetched_at=fetched_at)
 
-        if anuidades:
-            details['anuidades_json'] = json.dumps(anuidades, ensure_ascii=False)
+    def _count_cache_lookup(self, stat, result):
+        """
+        Count a detail cache lookup. Detail workers look up pages concurrently.
 
-        # Extract last update date
-        update_date_elem = soup.find("font", string=lambda text: text and "Dados atualizados até" in text)
-        if update_date_elem:
-            date_match = re.search(r'atualizados até\s+<b>\s*(\d{2}/\d{2}/\d{4})\s*</b>', str(update_date_elem))
-            if date_match:
-                details['last_update_date'] = self._remove_line_breaks(date_match.group(1))
+        Args:
+            stat (str): Key of cache_stats
+            result (str): Result label of the detail_cache_total metric
+        """
+        with self.cache_stats_lock:
+            self.cache_stats[stat] += 1
+        self.metrics.increment('detail_cache_total', result=result)
 
-        return details
+    def print_cache_stats(self):
+        """Print hit, miss and stale counts of the detail page cache"""
+        stats = self.cache_stats
+        print(f"Detail cache: {stats['hits']} hits, {stats['misses']} misses, {stats['stale']} stale")
+        print(f"Detail parsing: {self.parse_stats['parsed']} pages parsed, "
+              f"{self.parse_stats['memo_hits']} reused from identical content")
 
     def _save_detail_content(self, html_content, patent_id):
         """
@@ -783,17 +3218,7 @@ class INPIPatentScraper:
             html_content (str): The HTML content to save
             patent_id (str): The patent ID
         """
-        # Create cache directory if it doesn't exist
-        cache_dir = "inpi_cache/details"
-        if not os.path.exists(cache_dir):
-            os.makedirs(cache_dir)
-
-        # Generate a filename based on the patent ID
-        filename = f"{cache_dir}/patent_{patent_id}.html"
-
-        # Save the HTML content
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        self.page_cache.save_detail(patent_id, html_content)
 
     def fetch_all_details(self, max_patents=None, delay=True, continue_on_error=False):
         """
@@ -801,7 +3226,7 @@ class INPIPatentScraper:
 
         Args:
             max_patents (int, optional): Maximum number of patents to fetch details for. If None, fetch all.
-            delay (bool): Whether to add a delay between requests
+            delay (bool): Whether to pace requests with the rate limiter
             continue_on_error (bool): Whether to continue if a detail fetch fails
 
         Returns:
@@ -824,23 +3249,19 @@ class INPIPatentScraper:
         failures = []
 
         for i, patent in enumerate(patents_to_process):
-            print(f"Fetching details for patent {i+1}/{total}: {patent['patent_number']}")
+            print(f"Fetching details for patent {i+1}/{total}: {patent.patent_number}")
 
-            patent_id = patent.get('patent_id')
+            patent_id = patent.patent_id
 
             # Check if already fully processed (in CSV with details)
-            if patent_id in self.csv_patents_dict and self.csv_patents_dict[patent_id].get('has_details', False):
-                print(f"  Skipping already processed patent {patent['patent_number']} - already has details in CSV")
+            if patent_id in self.csv_detailed_ids:
+                print(f"  Skipping already processed patent {patent.patent_number} - already has details in CSV")
                 continue
 
-            # Add a delay between requests to be polite to the server
-            if delay and i > 0:
-                time.sleep(1.0)  # random.uniform(1.0, 3.0))
-
             # Check if session is still valid
             if not self.check_and_renew_session():
                 if continue_on_error:
-                    print(f"  Failed to maintain session for patent {patent['patent_number']}. Adding to failures list.")
+                    print(f"  Failed to maintain session for patent {patent.patent_number}. Adding to failures list.")
                     failures.append(patent)
                     continue
                 else:
@@ -852,19 +3273,15 @@ class INPIPatentScraper:
 
             # Fetch details
             details = self.get_patent_details(
-                patent['patent_id'],
-                search_param=patent.get('search_param', ''),
+                patent.patent_id,
+                search_param=patent.search_param,
                 resumo='',
-                titulo=''
+                titulo='',
+                rate_limited=delay
             )
 
             if details:
-                # Combine basic info with details, but keep original info if it conflicts
-                combined = patent.copy()
-                for key, value in details.items():
-                    if key not in combined:
-                        combined[key] = value
-                self.detailed_patents.append(combined)
+                self.detailed_patents.append(self._merge_details(patent, details))
 
                 # Update processed patents set
                 self.processed_patent_ids.add(patent_id)
@@ -874,7 +3291,7 @@ class INPIPatentScraper:
                     print(f"Saving intermediate results ({len(self.detailed_patents)} patents)")
                     self.append_to_csv()
             else:
-                print(f"FAILED to fetch details for patent {patent['patent_number']}")
+                print(f"FAILED to fetch details for patent {patent.patent_number}")
                 if continue_on_error:
                     failures.append(patent)
                 else:
@@ -887,18 +3304,655 @@ class INPIPatentScraper:
         if failures:
             print(f"\nFailed to fetch details for {len(failures)} patents:")
             for patent in failures:
-                print(f"  {patent['patent_number']} (ID: {patent['patent_id']})")
+                print(f"  {patent.patent_number} (ID: {patent.patent_id})")
 
         print(f"Successfully fetched details for {len(self.detailed_patents)} patents")
         return self.detailed_patents
 
+    def _merge_details(self, patent, details):
+        """
+        Combine basic search info with details, keeping the original info if it conflicts
+
+        Args:
+            patent (PatentHit): Patent from the search results
+            details (PatentDetails): Patent details from the detail page
+
+        Returns:
+            DetailedPatent: Combined patent data, referencing both records
+        """
+        return DetailedPatent(patent, details)
+
+    def _create_session(self):
+        """
+        Create a new session with its own copy of the current cookie jar
+
+        Returns:
+            requests.Session: The new session
+        """
+        session = requests.Session()
+        session.cookies.update(self.session.cookies)
+        return session
+
+    def _create_session_pool(self, workers):
+        """
+        Create one session per detail worker
+
+        Args:
+            workers (int): Number of workers
+
+        Returns:
+            queue.Queue: The idle sessions
+        """
+        sessions = queue.Queue()
+        for _ in range(workers):
+            sessions.put(self._create_session())
+        return sessions
+
+    def _fetch_pooled_details(self, sessions, patent_id, search_param='', use_cache=True):
+        """
+        Fetch the details of a patent on a session checked out of a pool.
+        Rate limiting and retries are done by get_patent_details().
+
+        Args:
+            sessions (queue.Queue): Idle sessions from _create_session_pool()
+            patent_id (str): The patent ID
+            search_param (str): Search parameter from the original search
+            use_cache (bool): Whether a fresh cached page may be used instead of requesting the page
+
+        Returns:
+            PatentDetails: The patent details or None if failed
+        """
+        session = sessions.get()
+        try:
+            return self.get_patent_details(patent_id, search_param=search_param, session=session,
+                                           use_cache=use_cache)
+        finally:
+            sessions.put(session)
+
+    def fetch_all_details_concurrent(self, workers=4, requests_per_second=None, max_patents=None, continue_on_error=False):
+        """
+        Fetch details for all patents in the results using a pool of sessions.
+        Results are committed to detailed_patents in the original order, so
+        intermediate saves only ever contain a contiguous prefix of the work.
+
+        Args:
+            workers (int): Number of concurrent workers, each with its own session
+            requests_per_second (float, optional): Highest rate the shared rate limiter may reach. If None, keep its current limit.
+            max_patents (int, optional): Maximum number of patents to fetch details for. If None, fetch all.
+            continue_on_error (bool): Whether to continue if a detail fetch fails
+
+        Returns:
+            list: List of dictionaries containing patent details
+        """
+        if not self.patents:
+            print("No patents to fetch details for. Run search() first.")
+            return []
+
+        patents_to_process = self.patents
+        if max_patents:
+            patents_to_process = self.patents[:max_patents]
+
+        # Skip patents that are already fully processed (in CSV with details)
+        patents_to_process = [p for p in patents_to_process
+                              if p.patent_id not in self.csv_detailed_ids]
+
+        total = len(patents_to_process)
+        if requests_per_second is not None:
+            self.rate_limiter.set_max_rate(requests_per_second)
+        print(f"Fetching details for {total} patents with {workers} workers...")
+
+        self.detailed_patents = []
+        failures = []
+
+        sessions = self._create_session_pool(workers)
+
+        results = {}
+        next_to_submit = 0
+        next_to_commit = 0
+        committed = 0
+        stopped = False
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = {}
+            while next_to_commit < total:
+                # Keep a bounded number of requests in flight
+                while not stopped and next_to_submit < total and len(pending) < workers * 2:
+                    patent = patents_to_process[next_to_submit]
+                    future = executor.submit(self._fetch_pooled_details, sessions, patent.patent_id,
+                                             patent.search_param)
+                    pending[future] = next_to_submit
+                    next_to_submit += 1
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    try:
+                        results[index] = future.result()
+                    except Exception as e:
+                        print(f"Error fetching details for patent {patents_to_process[index].patent_number}: {e}")
+                        results[index] = None
+
+                # Commit finished results in order
+                while next_to_commit in results:
+                    patent = patents_to_process[next_to_commit]
+                    details = results.pop(next_to_commit)
+                    next_to_commit += 1
+
+                    if details:
+                        print(f"Fetched details for patent {next_to_commit}/{total}: {patent.patent_number}")
+                        self.detailed_patents.append(self._merge_details(patent, details))
+                        self.processed_patent_ids.add(patent.patent_id)
+                        committed += 1
+
+                        # Save intermittently to avoid losing data on interruptions
+                        if committed % 10 == 0:
+                            print(f"Saving intermediate results ({len(self.detailed_patents)} patents)")
+                            self.append_to_csv()
+                    else:
+                        print(f"FAILED to fetch details for patent {patent.patent_number}")
+                        if continue_on_error:
+                            failures.append(patent)
+                        else:
+                            print("Stopping due to failure. Saving progress.")
+                            stopped = True
+                            break
+
+                if stopped:
+                    for future in pending:
+                        future.cancel()
+                    break
+
+        if stopped:
+            if self.detailed_patents:
+                self.append_to_csv()
+            return self.detailed_patents
+
+        if failures:
+            print(f"\nFailed to fetch details for {len(failures)} patents:")
+            for patent in failures:
+                print(f"  {patent.patent_number} (ID: {patent.patent_id})")
+
+        print(f"Successfully fetched details for {committed} patents")
+        return self.detailed_patents
+
+    def stream_search(self, query, search_column, workers=4, max_pages=None, continue_from_last=True,
+                      max_backlog=None, flush_every=10, continue_on_error=False):
+        """
+        Search and fetch details at the same time. Each results page is parsed
+        as soon as it arrives and its new patents are handed to the detail
+        workers, whose results are saved every flush_every patents. The next
+        page is only requested while fewer than max_backlog patents are waiting
+        for details, so memory stays bounded however many pages the query has.
+
+        Args:
+            query (str): Search query (e.g. "petroleo brasileiro")
+            search_column (str): Column to search in (e.g. "NomeDepositante", "Titulo", etc.)
+            workers (int): Number of concurrent detail workers, each with its own session
+            max_pages (int, optional): Maximum number of pages to scrape. If None, scrape all pages.
+            continue_from_last (bool): Whether to continue from the pages already processed
+            max_backlog (int, optional): Maximum number of patents waiting for details. Defaults to 4 per worker.
+            flush_every (int): Number of fetched patents between saves
+            continue_on_error (bool): Whether to continue if a detail fetch fails
+
+        Returns:
+            int: Number of patents whose details were fetched, or None if the search failed
+        """
+        if not self.check_and_renew_session():
+            return None
+
+        if continue_from_last and self.search_state['last_query'] == query and self.search_state['last_search_column'] == search_column:
+            print(f"Continuing search with {len(self._pages_done())} pages already processed")
+        else:
+            self._reset_search_state(query, search_column)
+
+        max_backlog = max_backlog or workers * 4
+        total_pages = self.search_state['total_pages']
+        page_limit = min(max_pages or total_pages, total_pages)
+        next_page = None
+        if 1 not in self._pages_done():
+            next_page = 1
+        elif self.search_state['has_more_pages']:
+            next_page = self._next_page_to_fetch(0, page_limit)
+
+        # Patents imported from the search state are fetched first
+        backlog = deque(p for p in self.patents if p.patent_id not in self.csv_detailed_ids)
+        queued_ids = {p.patent_id for p in backlog}
+        self.patents = []
+        self.detailed_patents = []
+
+        sessions = self._create_session_pool(workers)
+
+        def fetch_page(page):
+            if page == 1:
+                return self._submit_search(query, search_column)
+            return self._fetch_result_page(page)
+
+        print(f"Streaming search results to {workers} detail workers...")
+        started = time.monotonic()
+        first_detail_at = None
+        committed = 0
+        failures = []
+        stopped = False
+        search_failed = False
+        page_future = None
+
+        # One extra thread retrieves the result pages
+        with ThreadPoolExecutor(max_workers=workers + 1) as executor:
+            in_flight = {}
+            while True:
+                # Request the next page once the backlog has room for its patents
+                if page_future is None and next_page is not None and not stopped and \
+                        len(backlog) + len(in_flight) < max_backlog:
+                    if self.check_and_renew_session():
+                        page = next_page
+                        page_future = executor.submit(fetch_page, page)
+                    else:
+                        print("Failed to maintain session. Saving progress and exiting.")
+                        next_page = None
+
+                # Keep a bounded number of detail requests in flight
+                while not stopped and backlog and len(in_flight) < workers * 2:
+                    patent = backlog.popleft()
+                    in_flight[executor.submit(self._fetch_pooled_details, sessions, patent.patent_id,
+                                              patent.search_param)] = patent
+
+                waiting = set(in_flight)
+                if page_future is not None:
+                    waiting.add(page_future)
+                if not waiting:
+                    break
+
+                done, _ = wait(waiting, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future is page_future:
+                        page_future = None
+                        try:
+                            page_content = future.result()
+                        except Exception as e:
+                            print(f"Failed to retrieve page {page}: {e}")
+                            page_content = None
+
+                        if page_content is None:
+                            search_failed = page == 1
+                            next_page = None
+                            continue
+
+                        print(f"Scraped page {page} of {page_limit or '?'}")
+                        self._save_page_content(page_content, page=page)
+                        for patent in self._parse_page(page_content):
+                            if patent.patent_id not in queued_ids:
+                                queued_ids.add(patent.patent_id)
+                                backlog.append(patent)
+
+                        if page == 1:
+                            total_pages = self._read_total_pages(page_content)
+                            page_limit = min(max_pages or total_pages, total_pages)
+                        self._mark_page_done(page)
+                        self.save_search_state()
+                        if not stopped:
+                            next_page = self._next_page_to_fetch(page, page_limit)
+                        continue
+
+                    patent = in_flight.pop(future)
+                    try:
+                        details = future.result()
+                    except Exception as e:
+                        print(f"Error fetching details for patent {patent.patent_number}: {e}")
+                        details = None
+
+                    if details:
+                        if first_detail_at is None:
+                            first_detail_at = time.monotonic() - started
+                        print(f"Fetched details for patent {patent.patent_number}")
+                        self.detailed_patents.append(self._merge_details(patent, details))
+                        self.processed_patent_ids.add(patent.patent_id)
+                        committed += 1
+
+                        # Save intermittently to avoid losing data on interruptions
+                        if committed % flush_every == 0:
+                            print(f"Saving intermediate results ({len(self.detailed_patents)} patents)")
+                            self.append_to_csv()
+                    elif stopped:
+                        continue
+                    else:
+                        print(f"FAILED to fetch details for patent {patent.patent_number}")
+                        if continue_on_error:
+                            failures.append(patent)
+                        else:
+                            # Patents not fetched yet stay in the search state for the next run
+                            print("Stopping due to failure. Saving progress.")
+                            stopped = True
+                            next_page = None
+                            backlog.clear()
+                            for pending in in_flight:
+                                pending.cancel()
+
+        self.search_state['has_more_pages'] = (self.search_state['last_page_processed'] < total_pages or total_pages == 0)
+        self.save_search_state()
+        if self.detailed_patents:
+            self.append_to_csv()
+
+        if failures:
+            print(f"\nFailed to fetch details for {len(failures)} patents:")
+            for patent in failures:
+                print(f"  {patent.patent_number} (ID: {patent.patent_id})")
+
+        if first_detail_at is not None:
+            print(f"First patent details after {first_detail_at:.1f}s")
+        print(f"Successfully fetched details for {committed} patents in {time.monotonic() - started:.1f}s")
+        if search_failed:
+            return None
+        return committed
+
+    def refresh(self, max_patents=None, min_age_days=7, workers=1, flush_every=500):
+        """
+        Re-fetch the saved patents most likely to have changed and update them
+        in place. Every patent fetched at least min_age_days ago is ranked by
+        refresh_priority() and only the max_patents highest ranked ones are
+        fetched. Patents whose page was already current when the site last
+        published are skipped without a request.
+
+        Args:
+            max_patents (int, optional): Maximum number of patents to re-fetch. If None, re-fetch every candidate.
+            min_age_days (float): Minimum number of days since a patent was fetched
+            workers (int): Number of concurrent sessions
+            flush_every (int): Number of refreshed patents between saves
+
+        Returns:
+            dict: Number of refreshed, skipped and failed patents
+        """
+        now = datetime.now()
+        candidates = ((self.refresh_priority(row, now, min_age_days), row) for row in self._iter_saved_rows())
+        candidates = (candidate for candidate in candidates if candidate[0] is not None)
+        if max_patents:
+            selected = heapq.nlargest(max_patents, candidates, key=lambda candidate: candidate[0])
+        else:
+            selected = sorted(candidates, key=lambda candidate: candidate[0], reverse=True)
+        print(f"Refreshing {len(selected)} patents fetched more than {min_age_days} days ago")
+
+        sessions = self._create_session_pool(workers)
+
+        def fetch(row):
+            # Nothing was published for this patent since its page was fetched
+            row_date = self._parse_update_date(row.get('last_update_date'))
+            if self.site_update_date is not None and row_date is not None and row_date >= self.site_update_date:
+                return 'skipped'
+            return self._fetch_pooled_details(sessions, row['patent_id'], row.get('search_param') or '',
+                                              use_cache=False)
+
+        stats = {'refreshed': 0, 'skipped': 0, 'failed': 0}
+        updates = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for (_, row), details in zip(selected, executor.map(fetch, [row for _, row in selected])):
+                if details == 'skipped':
+                    stats['skipped'] += 1
+                    continue
+                if not details or details.patent_agent is None:
+                    print(f"FAILED to refresh patent {row.get('patent_number')}")
+                    stats['failed'] += 1
+                    continue
+
+                updates[row['patent_id']] = details
+                stats['refreshed'] += 1
+                if len(updates) >= flush_every:
+                    self._save_refreshed(updates)
+                    updates = {}
+
+        if updates:
+            self._save_refreshed(updates)
+
+        print(f"Refreshed {stats['refreshed']} patents, skipped {stats['skipped']} unchanged since the last "
+              f"site update, {stats['failed']} failed")
+        return stats
+
+    def refresh_priority(self, row, now, min_age_days=7):
+        """
+        Rank how likely a saved patent is to have changed since it was fetched.
+        The score grows with the days since the patent was fetched, and is
+        scaled down for patents whose last publication is old, since dormant
+        applications rarely get new dispatches, and for granted patents,
+        which mostly only receive annuity payments.
+
+        Args:
+            row (dict): Saved patent with at least last_update_date, grant_date, publications_json and fetched_at
+            now (datetime): Current time
+            min_age_days (float): Patents fetched more recently than this are not refreshed
+
+        Returns:
+            float: Priority, higher first, or None if the patent is too recent to refresh
+        """
+        def text(column):
+            value = row.get(column)
+            return None if value is None or (isinstance(value, float) and pd.isna(value)) else value
+
+        fetched_at = None
+        if text('fetched_at'):
+            try:
+                fetched_at = datetime.strptime(text('fetched_at'), "%Y-%m-%d %H:%M:%S")
+            except ValueError:
+                pass
+        # Rows saved before fetch times were recorded were current as of the site update date
+        known_at = fetched_at or self._parse_update_date(text('last_update_date'))
+        if known_at is None:
+            return float('inf')
+
+        age_days = (now - known_at).total_seconds() / 86400
+        if age_days < min_age_days:
+            return None
+
+        # The publication with the highest RPI number is the latest one
+        last_publication = None
+        try:
+            publications = json.loads(text('publications_json') or '[]')
+            latest = max(publications, key=lambda pub: int(pub.get('rpi') or 0), default=None)
+            if latest:
+                last_publication = self._parse_update_date(latest.get('date'))
+        except (ValueError, TypeError, AttributeError):
+            pass
+
+        dormant_days = (known_at - last_publication).days if last_publication else 3650
+        activity = 1 / (1 + max(dormant_days, 0) / 365)
+        if text('grant_date'):
+            activity *= 0.5
+        return age_days * activity
+
+    def _iter_saved_rows(self, chunksize=10000):
+        """
+        Yield the fields refresh_priority() needs for every saved patent with details
+
+        Args:
+            chunksize (int): Number of CSV rows read at a time
+
+        Yields:
+            dict: Saved patent fields
+        """
+        columns = ['patent_id', 'patent_number', 'search_param', 'patent_agent', 'last_update_date', 'grant_date',
+                   'publications_json', 'fetched_at']
+        if self.store is not None:
+            yield from self.store.iter_rows(columns)
+            return
+
+        if not os.path.exists(self.csv_file):
+            return
+        if self.csv_columns is None:
+            self._load_csv_index(self.csv_file)
+        usecols = [column for column in columns if column in self.csv_columns]
+        for chunk in pd.read_csv(self.csv_file, usecols=usecols, dtype=str, keep_default_na=False, chunksize=chunksize):
+            for row in chunk[chunk['patent_agent'] != ''].to_dict('records'):
+                yield row
+
+    @profiled_phase("persistence")
+    def _save_refreshed(self, updates):
+        """
+        Write refreshed details over the saved patents. The search result
+        fields of the saved rows, such as title and matched_queries, are kept.
+
+        Args:
+            updates (dict): PatentDetails by patent ID
+        """
+        hit_fields = {field.name for field in fields(PatentHit)}
+
+        if self.store is not None:
+            rows = self.store.get_patents(updates)
+        else:
+            rows = self.get_csv_rows(updates)
+
+        for patent_id, details in updates.items():
+            row = rows.setdefault(patent_id, {'patent_id': patent_id})
+            for key, value in details.to_dict().items():
+                if key not in hit_fields:
+                    row[key] = value
+
+        if self.store is not None:
+            self.store.upsert_patents(list(rows.values()))
+            print(f"Updated {len(rows)} refreshed patents in {self.store.db_file}")
+        else:
+            self._rewrite_csv_rows(rows)
+
+    def _rewrite_csv_rows(self, rows, chunksize=10000):
+        """
+        Replace some rows of the output CSV file. The file is rewritten in
+        chunks to a temporary file that then replaces it.
+
+        Args:
+            rows (dict): Full row dictionaries by patent ID
+            chunksize (int): Number of rows read at a time
+        """
+        filename = self.csv_file
+        new_columns = {column for row in rows.values() for column in row if column not in self.csv_columns}
+        columns = self.csv_columns + sorted(new_columns)
+
+        first = True
+        for chunk in pd.read_csv(filename, dtype=str, keep_default_na=False, chunksize=chunksize):
+            chunk = chunk.reindex(columns=columns, fill_value='').astype(object)
+            replaced = chunk['patent_id'].isin(rows)
+            if replaced.any():
+                chunk.loc[replaced] = pd.DataFrame([rows[patent_id] for patent_id in chunk.loc[replaced, 'patent_id']],
+                                                   index=chunk.index[replaced]).reindex(columns=columns)
+            chunk.to_csv(filename + ".tmp", mode='w' if first else 'a', header=first, index=False, encoding='utf-8')
+            first = False
+
+        os.replace(filename + ".tmp", filename)
+        self.csv_columns = columns
+        print(f"Updated {len(rows)} refreshed patents in {filename}")
+
+    def _next_page_to_fetch(self, page, page_limit):
+        """
+        Return the first page after the given page that was not processed yet
+
+        Args:
+            page (int): The last page requested
+            page_limit (int): Last page of the search
+
+        Returns:
+            int: The page number, or None if there are no more pages
+        """
+        pages_done = self._pages_done()
+        for next_page in range(page + 1, page_limit + 1):
+            if next_page not in pages_done:
+                return next_page
+        return None
+
+    def _load_csv_index(self, csv_filename):
+        """
+        Load the patent ID index and column schema of an existing CSV file.
+        Only the columns needed for the index are read.
+
+        Args:
+            csv_filename (str): Name of the CSV file to load
+
+        Returns:
+            bool: True if the file exists, False otherwise
+        """
+        self.csv_patent_ids = set()
+        self.csv_detailed_ids = set()
+
+        if not os.path.exists(csv_filename):
+            self.csv_columns = None
+            return False
+
+        self.csv_columns = list(pd.read_csv(csv_filename, nrows=0).columns)
+        if 'patent_id' in self.csv_columns:
+            index_columns = [col for col in ('patent_id', 'patent_agent') if col in self.csv_columns]
+            self._index_csv_rows(pd.read_csv(csv_filename, usecols=index_columns, dtype=str))
+        return True
+
+    def _index_csv_rows(self, df):
+        """
+        Add the rows of a DataFrame to the index of patents stored in the CSV
+
+        Args:
+            df (DataFrame): Rows that are stored in the CSV file
+        """
+        patent_ids = df['patent_id'].astype(str)
+        self.csv_patent_ids.update(patent_ids)
+
+        # A row has details once the detail-only patent_agent field is filled
+        if 'patent_agent' in df.columns:
+            has_details = df['patent_agent'].notna().to_numpy()
+            self.csv_detailed_ids.update(patent_ids[has_details])
+
+    def _is_missing_details(self, patent_id):
+        """Return True if the patent is in the CSV but its row has no details"""
+        return patent_id in self.csv_patent_ids and patent_id not in self.csv_detailed_ids
+
+    def get_csv_rows(self, patent_ids, chunksize=10000):
+        """
+        Build full row dictionaries for some patents stored in the CSV. Cells
+        are read as text, so they can be written back unchanged.
+
+        Args:
+            patent_ids (iterable): IDs of the patents to load
+            chunksize (int): Number of rows read at a time
+
+        Returns:
+            dict: Row dictionaries by patent ID
+        """
+        wanted = set(str(patent_id) for patent_id in patent_ids)
+        rows = {}
+        if not wanted or not os.path.exists(self.csv_file):
+            return rows
+
+        for chunk in pd.read_csv(self.csv_file, dtype=str, keep_default_na=False, chunksize=chunksize):
+            for row in chunk[chunk['patent_id'].isin(wanted)].to_dict('records'):
+                rows[row['patent_id']] = row
+        return rows
+
+    def _extend_csv_columns(self, new_columns):
+        """
+        Add new columns to the output CSV file. This rewrites the whole file,
+        which only happens when a flush brings fields the file has never seen.
+
+        Args:
+            new_columns (list): Names of the columns to add
+        """
+        filename = self.csv_file
+        print(f"Adding columns {new_columns} to {filename}")
+        # Copy the existing cells as text so values such as leading zeros are kept as they are
+        with open(filename, 'r', newline='', encoding='utf-8') as source, \
+                open(filename + ".tmp", 'w', newline='', encoding='utf-8') as target:
+            reader = csv.reader(source)
+            writer = csv.writer(target, lineterminator="\n")
+            columns = next(reader) + list(new_columns)
+            writer.writerow(columns)
+            padding = [''] * len(new_columns)
+            for row in reader:
+                writer.writerow(row + padding)
+        os.replace(filename + ".tmp", filename)
+        self.csv_columns = columns
+
+    @profiled_phase("persistence")
     def append_to_csv(self):
         """
         Append the newly scraped patents to an existing CSV file.
         If the file doesn't exist, create it.
 
-        Args:
-            filename (str): Name of the CSV file
+        Duplicates are filtered against the in-memory index of patent IDs and
+        the column schema loaded once, so a flush only costs time proportional
+        to the new rows.
 
         Returns:
             DataFrame: The DataFrame containing the newly appended data
@@ -908,10 +3962,16 @@ class INPIPatentScraper:
             print("No detailed patents to save.")
             return None
 
+        if self.store is not None:
+            return self._save_to_store()
+
+        start = time.perf_counter()
+
         # Convert to DataFrame
-        df_new = pd.DataFrame(self.detailed_patents)
+        df_new = pd.DataFrame([patent.to_dict() for patent in self.detailed_patents])
         required_columns = ['patent_number', 'filing_date', 'patent_id', 'title', 'ipc', 'patent_number_raw', 'search_param', 'patent_number_full', 'filing_date_detail',
-                            'publication_date', 'grant_date', 'applicants', 'applicants_raw', 'patent_agent', 'ipc_codes', 'abstract', 'inventors_raw', 'inventors']
+                            'publication_date', 'grant_date', 'applicants', 'applicants_raw', 'patent_agent', 'ipc_codes', 'abstract', 'inventors_raw', 'inventors',
+                            'publications_json', 'petitions_json', 'anuidades_json', 'last_update_date', 'fetched_at']
         for column in required_columns:
             if column not in df_new.columns:
                 df_new[column] = None
@@ -927,89 +3987,100 @@ class INPIPatentScraper:
         # Drop columns if they exist
         df_new = df_new.drop(columns=[col for col in columns_to_drop if col in df_new.columns], errors='ignore')
 
+        # Load the index once if load_existing_data() was not called for this file
+        if self.csv_columns is None and os.path.isfile(filename):
+            self._load_csv_index(filename)
+
         # Check if file exists
         file_exists = os.path.isfile(filename)
 
         if file_exists:
-            # Load existing data to check if we need to append
-            df_existing = pd.read_csv(filename)
-
             # Only append if we have new data
             if not df_new.empty:
                 # Check if any of the new patents are already in the existing data
-                if 'patent_id' in df_existing.columns:
-                    existing_ids = set(df_existing['patent_id'].astype(str))
-                    df_new = df_new[~df_new['patent_id'].astype(str).isin(existing_ids)]
-
-                # Append only if we have new data after filtering
-                if not df_new.empty:
-                    # Make sure columns match
-                    all_columns = set(df_existing.columns) | set(df_new.columns)
-
-                    # Add missing columns to both dataframes
-                    for col in all_columns:
-                        if col not in df_existing.columns:
-                            df_existing[col] = None
-                        if col not in df_new.columns:
-                            df_new[col] = None
-
-                    # Reorder columns to match
-                    df_new = df_new[df_existing.columns]
-
-                    # Append to CSV
-                    df_new.to_csv(filename, mode='a', header=False, index=False, encoding='utf-8')
-                    print(f"Appended {len(df_new)} new patents to {filename}")
-
-                    # Update our tracking dictionary
-                    for _, row in df_new.iterrows():
-                        patent_id = str(row['patent_id'])
-                        self.csv_patents_dict[patent_id] = {
-                            'patent_number': row.get('patent_number', ''),
-                            'has_details': 'patent_agent' in df_new.columns and not pd.isna(row.get('patent_agent', '')),
-                            'row': row.to_dict()
-                        }
+                already_saved = df_new['patent_id'].astype(str).map(lambda patent_id: patent_id in self.csv_patent_ids)
+                df_new = df_new[~already_saved]
 
-                        # Add to processed ids
-                        self.processed_patent_ids.add(patent_id)
+            # Append only if we have new data after filtering
+            if df_new.empty:
+                print("No new patents to append.")
+                return df_new
 
-                    # Clear detailed_patents after saving to avoid duplicate appends
-                    self.detailed_patents = []
+            # Make sure columns match
+            new_columns = [col for col in df_new.columns if col not in self.csv_columns]
+            if new_columns:
+                self._extend_csv_columns(new_columns)
 
-                    # Return combined data for reference
-                    return pd.concat([df_existing, df_new], ignore_index=True)
-                else:
-                    print("No new patents to append.")
-                    return df_existing
-            else:
-                print("No new patents to append.")
-                return df_existing
+            # Reorder columns to match, adding the ones this batch doesn't have
+            df_new = df_new.reindex(columns=self.csv_columns)
+
+            # Append to CSV
+            df_new.to_csv(filename, mode='a', header=False, index=False, encoding='utf-8')
+            print(f"Appended {len(df_new)} new patents to {filename}")
         else:
             # Create new file
             df_new.to_csv(filename, index=False, encoding='utf-8')
+            self.csv_columns = list(df_new.columns)
             print(f"Created new file {filename} with {len(df_new)} patents")
 
-            # Update our tracking dictionary
-            for _, row in df_new.iterrows():
-                patent_id = str(row['patent_id'])
-                self.csv_patents_dict[patent_id] = {
-                    'patent_number': row.get('patent_number', ''),
-                    'has_details': 'patent_agent' in df_new.columns and not pd.isna(row.get('patent_agent', '')),
-                    'row': row.to_dict()
-                }
+        # Update our tracking dictionary and processed ids
+        self._index_csv_rows(df_new)
+        self.processed_patent_ids.update(df_new['patent_id'].astype(str))
+        self.metrics.observe('flush_seconds', time.perf_counter() - start, output="csv")
 
-                # Add to processed ids
-                self.processed_patent_ids.add(patent_id)
+        # Send the same rows to the other output sinks
+        self._write_sinks(df_new)
+
+        # Clear detailed_patents after saving to avoid duplicate appends
+        self.detailed_patents = []
+        self.metrics.export()
+
+        return df_new
+
+    def _save_to_store(self):
+        """
+        Upsert the newly scraped patents into the SQLite store in a single transaction
 
-            # Clear detailed_patents after saving to avoid duplicate appends
-            self.detailed_patents = []
+        Returns:
+            DataFrame: The DataFrame containing the saved data
+        """
+        with self.metrics.timer('flush_seconds', output="sqlite"):
+            records = [patent.to_dict() for patent in self.detailed_patents]
+            self.store.upsert_patents(records)
+        df_new = pd.DataFrame(records)
+        print(f"Saved {len(df_new)} patents to {self.store.db_file}")
+
+        self._index_csv_rows(df_new.reindex(columns=['patent_id', 'patent_agent']))
+        self.processed_patent_ids.update(df_new['patent_id'].astype(str))
+
+        self._write_sinks(df_new)
+
+        self.detailed_patents = []
+        self.metrics.export()
+        return df_new
+
+    def _write_sinks(self, df_new):
+        """
+        Send saved rows to the extra output sinks
 
-            return df_new
+        Args:
+            df_new (DataFrame): The rows just saved
+        """
+        for sink in self.sinks:
+            with self.metrics.timer('flush_seconds', output=type(sink).__name__):
+                sink.write(df_new)
 
+    def close_sinks(self):
+        """Close the extra output sinks"""
+        for sink in self.sinks:
+            sink.close()
+
+    @profiled_phase("auth")
     def is_authenticated(self):
         """Check if the current session is authenticated"""
+        self.session_stats['probes'] += 1
         try:
-            test_url = "https://busca.inpi.gov.br/pePI/jsp/patentes/PatenteSearchBasico.jsp"
-            response = self.session.get(test_url)
+            response = self._request('GET', self.auth_check_url, timeout=30, endpoint="auth_probe")
 
             # Check for indicators of being logged in
             auth_indicator = "Finalizar Sessão" in response.text
@@ -1019,13 +4090,17 @@ class INPIPatentScraper:
 
             if login_page:
                 self.session_expired = True
+                self.session_validated_at = None
+                self.metrics.increment('session_expired_total')
                 return False
 
             self.session_expired = not auth_indicator
+            self.session_validated_at = time.monotonic() if auth_indicator else None
             return auth_indicator
         except Exception as e:
             print(f"Error checking authentication: {e}")
             self.session_expired = True
+            self.session_validated_at = None
             return False
 
     def _debug_response(self, response, label="debug"):
@@ -1049,30 +4124,374 @@ class INPIPatentScraper:
         webbrowser.open('file://' + file_path)
 
 
+# Labels of the detail page and the handlers that read the value following them
+DETAIL_LABEL_HANDLERS = (
+    ("Data do Depósito:", INPIPatentScraper._handle_filing_date),
+    ("Data da Publicação:", INPIPatentScraper._handle_publication_date),
+    ("Data da Concessão:", INPIPatentScraper._handle_grant_date),
+    ("Nome do Depositante:", INPIPatentScraper._handle_applicants),
+    ("Nome do Inventor:", INPIPatentScraper._handle_inventors),
+    ("Nome do Procurador:", INPIPatentScraper._handle_patent_agent),
+)
+
+# Scraper used by reparse worker processes, created once per process
+_offline_scraper = None
+
+
+def _init_offline_scraper(parser_backend=DEFAULT_PARSER_BACKEND):
+    """Create the per-process scraper used for parsing. It never logs in."""
+    global _offline_scraper
+    _offline_scraper = INPIPatentScraper(csv_file=None, state_file=None, use_browser_cookies=False,
+                                         parser_backend=parser_backend)
+
+
+def _get_offline_scraper():
+    """Return the per-process scraper that is only used for parsing"""
+    if _offline_scraper is None:
+        _init_offline_scraper()
+    return _offline_scraper
+
+
+def _reparse_search_page(path):
+    """
+    Parse a cached search results page
+
+    Args:
+        path (str): Path to the cached search page
+
+    Returns:
+        list: PatentHit records found on the page
+    """
+    return list(_get_offline_scraper().iter_patents(read_cached_page(path)))
+
+
+def _reparse_detail_page(path):
+    """
+    Parse a cached detail page
+
+    Args:
+        path (str): Path to the cached detail page
+
+    Returns:
+        tuple: Patent ID and PatentDetails
+    """
+    scraper = _get_offline_scraper()
+    patent_id = re.search(r'patent_(\d+)\.html(?:\.lz4)?$', path).group(1)
+    return patent_id, scraper._parse_detail_page(read_cached_page(path))
+
+
+def _cached_page_number(path):
+    """Sort key for cached search pages: query hash, then numeric page number"""
+    match = re.search(r'search_(\w+)_page_(\d+)\.html$', path)
+    if match is None:
+        # Sharded layout: <query hash>/page_<n>.html[.lz4]
+        match = re.search(r'(\w+)[\\/]page_(\d+)\.html(?:\.lz4)?$', path)
+    return (match.group(1), int(match.group(2))) if match else (path, 0)
+
+
+def _list_cached_pages(cache_dir=CACHE_DIR):
+    """
+    List the cached search and detail pages
+
+    Args:
+        cache_dir (str): Folder containing the cached pages
+
+    Returns:
+        tuple: Lists of search page paths and detail page paths
+    """
+    return PageCache(cache_dir, compress=False).list_pages()
+
+
+def reparse_cache(output_file, cache_dir=CACHE_DIR, workers=None, parser_backend=DEFAULT_PARSER_BACKEND,
+                  parquet_dir=None):
+    """
+    Rebuild the dataset from the cached HTML pages without any network access
+
+    Args:
+        output_file (str): Name of the CSV file to write. It is replaced if it exists.
+        cache_dir (str): Folder containing the cached pages
+        workers (int, optional): Number of worker processes. If None, use all cores.
+        parser_backend (str): Parser backend used by the workers
+        parquet_dir (str, optional): Also write the patents to a Parquet dataset in this folder
+
+    Returns:
+        DataFrame: The DataFrame that was written, or None if nothing was found
+    """
+    search_files, detail_files = _list_cached_pages(cache_dir)
+    print(f"Reparsing {len(search_files)} search pages and {len(detail_files)} detail pages from {cache_dir}")
+
+    found_patents = {}
+    details_by_id = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_offline_scraper,
+                             initargs=(parser_backend,)) as executor:
+        for patents in executor.map(_reparse_search_page, search_files, chunksize=16):
+            for patent in patents:
+                found_patents[patent.patent_id] = patent
+        for patent_id, details in executor.map(_reparse_detail_page, detail_files, chunksize=16):
+            details_by_id[patent_id] = details
+
+    print(f"Found {len(found_patents)} patents in search pages and {len(details_by_id)} detail pages")
+
+    # Only patents with a detail page end up in the output, as in a live scrape
+    scraper = INPIPatentScraper(csv_file=output_file + ".tmp", state_file=None, use_browser_cookies=False)
+    for patent_id, details in details_by_id.items():
+        patent = found_patents.get(patent_id)
+        if patent is None:
+            details.patent_id = patent_id
+        scraper.detailed_patents.append(scraper._merge_details(patent, details))
+
+    if not scraper.detailed_patents:
+        print("No cached detail pages to reparse.")
+        return None
+
+    if parquet_dir:
+        scraper.sinks.append(ParquetSink(parquet_dir))
+
+    if os.path.exists(scraper.csv_file):
+        os.remove(scraper.csv_file)
+    df = scraper.append_to_csv()
+    scraper.close_sinks()
+    os.replace(scraper.csv_file, output_file)
+    print(f"Wrote {len(df)} reparsed patents to {output_file}")
+    return df
+
+
+def _compare_parsed(reference, candidate, label):
+    """
+    Compare two parse results field by field
+
+    Args:
+        reference: Result of the reference parser
+        candidate: Result of the parser being checked
+        label (str): Name of the page, used in the report
+
+    Returns:
+        list: Human readable description of every differing field
+    """
+    if isinstance(reference, list):
+        differences = []
+        if len(reference) != len(candidate):
+            differences.append(f"{label}: {len(reference)} rows vs {len(candidate)} rows")
+        for i, (ref_row, cand_row) in enumerate(zip(reference, candidate)):
+            differences.extend(_compare_parsed(ref_row, cand_row, f"{label} row {i}"))
+        return differences
+
+    reference, candidate = reference.to_dict(), candidate.to_dict()
+    differences = []
+    for field in sorted(set(reference) | set(candidate)):
+        if reference.get(field) != candidate.get(field):
+            differences.append(f"{label} [{field}]: {reference.get(field)!r} != {candidate.get(field)!r}")
+    return differences
+
+
+def check_parser_parity(parser_backend, cache_dir=CACHE_DIR, limit=None):
+    """
+    Check that a parser backend produces the same output as html.parser
+    on the cached search and detail pages
+
+    Args:
+        parser_backend (str): Parser backend to check
+        cache_dir (str): Folder containing the cached pages
+        limit (int, optional): Maximum number of pages of each type to check
+
+    Returns:
+        list: Description of every differing field, empty if the outputs match
+    """
+    reference = INPIPatentScraper(csv_file=None, state_file=None, use_browser_cookies=False)
+    candidate = INPIPatentScraper(csv_file=None, state_file=None, use_browser_cookies=False,
+                                  parser_backend=parser_backend)
+
+    search_files, detail_files = _list_cached_pages(cache_dir)
+    if limit:
+        search_files, detail_files = search_files[:limit], detail_files[:limit]
+
+    differences = []
+    for path in search_files:
+        html_content = read_cached_page(path)
+        differences.extend(_compare_parsed(list(reference.iter_patents(html_content)),
+                                           list(candidate.iter_patents(html_content)),
+                                           os.path.basename(path)))
+
+    for path in detail_files:
+        html_content = read_cached_page(path)
+        differences.extend(_compare_parsed(reference._parse_detail_page(html_content),
+                                           candidate._parse_detail_page(html_content),
+                                           os.path.basename(path)))
+
+    print(f"Checked {candidate.parser_backend} against html.parser on {len(search_files)} search pages "
+          f"and {len(detail_files)} detail pages: {len(differences)} differences")
+    for difference in differences:
+        print(f"  {difference}")
+    return differences
+
+
+def read_batch_jobs(filename):
+    """
+    Read the searches of a batch file. Each line holds a search column and
+    a query separated by a tab; blank lines and lines starting with # are skipped.
+
+    Args:
+        filename (str): Name of the batch file
+
+    Returns:
+        list: List of (search_column, query) pairs
+    """
+    jobs = []
+    with open(filename, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split('\t', 1)
+            if len(parts) != 2 or not parts[0].strip() or not parts[1].strip():
+                raise ValueError(f"{filename}:{line_number}: expected a search column and a query separated by a tab")
+            jobs.append((parts[0].strip(), parts[1].strip()))
+    return list(dict.fromkeys(jobs))
+
+
+def file_suffix(search_column, query):
+    """Return the suffix of the output and state file names of a search"""
+    return f'{search_column.replace(" ", "")}-{query.replace(" ", "")}'
+
+
 # Example usage
 if __name__ == "__main__":
     # Create the parser
     parser = argparse.ArgumentParser(description="INPI Scraper")
 
     # Add positional arguments
-    parser.add_argument("search_column", help="Search column")
-    parser.add_argument("text_to_search", help="Text to search")
+    parser.add_argument("search_column", nargs="?", help="Search column")
+    parser.add_argument("text_to_search", nargs="?", help="Text to search")
+    parser.add_argument("--batch", metavar="JOBS_FILE",
+                        help="Run every search in JOBS_FILE (search column<TAB>query per line) into one output file")
+    parser.add_argument("--reparse", metavar="OUTPUT_CSV",
+                        help="Rebuild OUTPUT_CSV from the cached pages in --cache-dir without any network access")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Folder containing the cached pages")
+    parser.add_argument("--migrate-cache", action="store_true",
+                        help="Import the flat page cache in --cache-dir into the compressed sharded layout and exit")
+    parser.add_argument("--remove-flat-cache", action="store_true",
+                        help="With --migrate-cache, delete every flat cache file once it is imported")
+    parser.add_argument("--parser", choices=PARSER_BACKENDS, default=DEFAULT_PARSER_BACKEND,
+                        help="HTML parser backend used to parse search and detail pages")
+    parser.add_argument("--db", metavar="DB_FILE",
+                        help="Keep patents and search progress in this SQLite database instead of the CSV and JSON files")
+    parser.add_argument("--parquet", metavar="DATASET_DIR",
+                        help="Also write saved patents to a Parquet dataset partitioned by filing year")
+    parser.add_argument("--check-parser-parity", action="store_true",
+                        help="Compare the --parser backend with html.parser on the cached pages and exit")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of concurrent sessions used to fetch detail pages (1 fetches sequentially)")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Re-fetch the saved patents most likely to have changed instead of searching")
+    parser.add_argument("--refresh-limit", type=int, default=None,
+                        help="Maximum number of patents re-fetched by --refresh")
+    parser.add_argument("--refresh-min-age", type=float, default=7,
+                        help="Only refresh patents fetched more than this many days ago")
+    parser.add_argument("--incremental", type=int, metavar="PAGES",
+                        help="Restart the search from the first page and stop after PAGES consecutive pages "
+                             "of already known patents")
+    parser.add_argument("--partition-dates", nargs=2, metavar=("START", "END"),
+                        help="Split the search into filing date ranges between START and END (DD/MM/YYYY) "
+                             "and walk them with --search-sessions sessions")
+    parser.add_argument("--partition-max-pages", type=int, default=200,
+                        help="Largest number of result pages of a filing date range")
+    parser.add_argument("--metrics-file", metavar="PROM_FILE",
+                        help="Write request, parse and flush metrics to PROM_FILE in the Prometheus text format")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Serve the metrics in the Prometheus text format on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile the auth, search, detail fetch, detail parse and persistence phases separately")
+    parser.add_argument("--profile-mode", default="sample", choices=PhaseProfiler.MODES,
+                        help="With --profile, 'sample' (default, low overhead) or 'cprofile'")
+    parser.add_argument("--profile-out", metavar="PATH", default="profiles",
+                        help="Folder for the --profile output files")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="With --profile, also keep a tracemalloc snapshot of every phase")
+    parser.add_argument("--stream", action="store_true",
+                        help="Fetch details with --workers sessions while the result pages are still being retrieved")
+    parser.add_argument("--search-sessions", type=int, default=1,
+                        help="Number of independent search sessions retrieving result pages in parallel, "
+                             "or walking the --partition-dates ranges")
+    parser.add_argument("--rps", type=float, default=1.0,
+                        help="Initial request rate in requests per second, adapted to the server latency")
+    parser.add_argument("--max-rps", type=float, default=2.0,
+                        help="Highest request rate the adaptive rate limiter may reach")
+    parser.add_argument("--max-retries", type=int, default=3,
+                        help="Number of retries for server errors and timeouts")
+    parser.add_argument("--cache-max-age", type=float, default=None,
+                        help="Serve cached detail pages younger than this many seconds without fetching them again")
+    parser.add_argument("--no-detail-cache", action="store_true",
+                        help="Always fetch detail pages from the site instead of reading inpi_cache")
+    parser.add_argument("--session-ttl", type=float, default=300,
+                        help="Seconds a session stays trusted without an authentication probe (0 probes before every request)")
 
     # Parse the arguments
     args = parser.parse_args()
 
-    # Access the arguments
-    print(f"Search column: {args.search_column}")
-    print(f"Text to search: {args.text_to_search}")
+    if args.check_parser_parity:
+        differences = check_parser_parity(args.parser, cache_dir=args.cache_dir)
+        sys.exit(1 if differences else 0)
+
+    if args.migrate_cache:
+        search_count, detail_count = PageCache(args.cache_dir).migrate_flat(remove=args.remove_flat_cache)
+        print(f"Imported {search_count} search pages and {detail_count} detail pages into the sharded cache")
+        sys.exit(0)
+
+    if args.reparse:
+        reparse_cache(args.reparse, cache_dir=args.cache_dir, parser_backend=args.parser, parquet_dir=args.parquet)
+        sys.exit(0)
+
+    # stream_search() walks a single search with one search session
+    if args.stream:
+        for flag, value in (("--batch", args.batch), ("--partition-dates", args.partition_dates),
+                            ("--incremental", args.incremental), ("--refresh", args.refresh)):
+            if value:
+                parser.error(f"--stream cannot be combined with {flag}")
+        if args.search_sessions > 1:
+            parser.error("--stream retrieves the result pages with one search session, drop --search-sessions")
+
+    # A partitioned search walks its date ranges with --search-sessions sessions, one query at a time
+    if args.partition_dates:
+        for flag, value in (("--batch", args.batch), ("--incremental", args.incremental),
+                            ("--refresh", args.refresh)):
+            if value:
+                parser.error(f"--partition-dates cannot be combined with {flag}")
+
+    if args.batch:
+        jobs = read_batch_jobs(args.batch)
+        if not jobs:
+            parser.error(f"{args.batch} does not contain any search")
+        print(f"Batch of {len(jobs)} searches from {args.batch}")
+        suffix = f"batch-{os.path.splitext(os.path.basename(args.batch))[0]}"
+        state_file = f"inpi_search_state_{file_suffix(*jobs[0])}.json"
+    else:
+        if not args.search_column or not args.text_to_search:
+            parser.error("search_column and text_to_search are required unless --batch or --reparse is used")
+
+        # Access the arguments
+        print(f"Search column: {args.search_column}")
+        print(f"Text to search: {args.text_to_search}")
 
-    suffix = f'{args.search_column.replace(" ", "")}-{args.text_to_search.replace(" ", "")}'
+        suffix = file_suffix(args.search_column, args.text_to_search)
+        state_file = f"inpi_search_state_{suffix}.json"
 
     # File paths for data storage
     output_file = f"inpi_combined_patents_{suffix}.csv"
-    state_file = f"inpi_search_state_{suffix}.json"
 
     # Create scraper with cookies and debug mode (set to False for production)
-    scraper = INPIPatentScraper(cookies=COOKIES_STRING, debug=False, csv_file=output_file, state_file=state_file)
+    scraper = INPIPatentScraper(cookies=COOKIES_STRING, debug=False, csv_file=output_file, state_file=state_file,
+                                session_check_ttl=args.session_ttl, use_detail_cache=not args.no_detail_cache,
+                                detail_cache_max_age=args.cache_max_age, parser_backend=args.parser,
+                                db_file=args.db, requests_per_second=args.rps, max_requests_per_second=args.max_rps,
+                                max_retries=args.max_retries)
+    if args.parquet:
+        scraper.sinks.append(ParquetSink(args.parquet))
+    if args.metrics_file:
+        scraper.metrics.exporters.append(PrometheusTextfileExporter(args.metrics_file))
+    if args.metrics_port:
+        scraper.metrics.exporters.append(MetricsHTTPExporter(scraper.metrics, args.metrics_port))
+    if args.profile:
+        scraper.profiler = PhaseProfiler(args.profile_out, mode=args.profile_mode, trace_memory=args.profile_memory)
 
     if not scraper.is_authenticated():
         print("Failed to authenticate. Exiting.")
@@ -1081,31 +4500,71 @@ if __name__ == "__main__":
     # Load existing data and search state to avoid re-scraping
     scraper.load_existing_data(csv_filename=output_file, state_filename=state_file)
 
-    # Will continue from last page processed if available
-    results = scraper.search(args.text_to_search, search_column=args.search_column, max_pages=200, continue_from_last=True)
+    if args.refresh:
+        scraper.refresh(max_patents=args.refresh_limit, min_age_days=args.refresh_min_age, workers=args.workers)
+    elif args.stream:
+        # Fetch details while the search pages are still being retrieved
+        fetched = scraper.stream_search(args.text_to_search, search_column=args.search_column, workers=args.workers,
+                                        max_pages=200, continue_from_last=True)
+        if fetched is None:
+            print("Search failed.")
+        else:
+            print(f"\nTotal patents in database: {len(scraper.csv_patent_ids)}")
+        scraper.save_search_state(compact=True)
+    else:
+        # Will continue from last page processed if available
+        if args.batch:
+            results = scraper.search_batch(jobs, lambda column, query: f"inpi_search_state_{file_suffix(column, query)}.json",
+                                           max_pages=200, sessions=args.search_sessions)
+            scraper.save_query_matches(f"inpi_query_matches_{suffix}.csv")
+        elif args.partition_dates:
+            results = scraper.search_partitioned(args.text_to_search, search_column=args.search_column,
+                                                 start_date=args.partition_dates[0], end_date=args.partition_dates[1],
+                                                 sessions=args.search_sessions, max_pages=args.partition_max_pages,
+                                                 continue_from_last=True)
+        elif args.search_sessions > 1 and not args.incremental:
+            results = scraper.search_parallel(args.text_to_search, search_column=args.search_column,
+                                              sessions=args.search_sessions, max_pages=200, continue_from_last=True)
+        else:
+            results = scraper.search(args.text_to_search, search_column=args.search_column, max_pages=200,
+                                     continue_from_last=True, stop_after_known_pages=args.incremental)
 
-    # Show the first few results from the search
-    if results is not None and not results.empty:
-        print("\nSearch Results Preview:")
-        print(results[['patent_number', 'filing_date']].head())
+        # Show the first few results from the search
+        if results is not None and not results.empty:
+            print("\nSearch Results Preview:")
+            print(results[['patent_number', 'filing_date']].head())
 
-        # Fetch details for all new patents found and append to CSV periodically
-        detailed_patents = scraper.fetch_all_details(continue_on_error=False)
+            # Fetch details for all new patents found and append to CSV periodically
+            if args.workers > 1:
+                detailed_patents = scraper.fetch_all_details_concurrent(workers=args.workers, continue_on_error=False)
+            else:
+                detailed_patents = scraper.fetch_all_details(continue_on_error=False)
 
-        # Final append to CSV for any remaining patents
-        if scraper.detailed_patents:
-            combined_df = scraper.append_to_csv()
+            # Final append to CSV for any remaining patents
+            if scraper.detailed_patents:
+                combined_df = scraper.append_to_csv()
 
-            # Print summary
-            if combined_df is not None:
-                print(f"\nTotal patents in database: {len(combined_df)}")
-        else:
-            print("No new details to append.")
+                # Print summary
+                if combined_df is not None:
+                    print(f"\nTotal patents in database: {len(scraper.csv_patent_ids)}")
+            else:
+                print("No new details to append.")
 
-        # Update search state one last time
-        scraper.save_search_state()
-    else:
-        if not scraper.search_state['has_more_pages']:
-            print("All pages have been processed. Search is complete.")
+            # Update search state one last time
+            scraper.save_search_state(compact=True)
         else:
-            print("No new patents found on the pages processed, or search failed.")
+            if not scraper.search_state['has_more_pages']:
+                print("All pages have been processed. Search is complete.")
+            else:
+                print("No new patents found on the pages processed, or search failed.")
+
+    scraper.close_sinks()
+    if scraper.store is not None:
+        scraper.store.close()
+    scraper.print_session_stats()
+    scraper.print_cache_stats()
+    scraper.print_rate_stats()
+    scraper.metrics.print_summary()
+    scraper.metrics.close()
+    if scraper.profiler is not None:
+        scraper.profiler.close()
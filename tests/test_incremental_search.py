@@ -0,0 +1,83 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import StandInHandler, offline_scraper, quiet
+
+
+class IncrementalSearchTest(unittest.TestCase):
+    """Searches resumed from a saved search state with pending hits"""
+
+    def setUp(self):
+        StandInHandler.total_pages = 3
+        StandInHandler.per_page = 5
+        StandInHandler.latency = 0.0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}/pePI"
+
+        # The scraper writes its page cache in the working folder
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.TemporaryDirectory()
+        os.chdir(self.workdir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.workdir.cleanup()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def scraper(self):
+        client = offline_scraper(csv_file="patents.csv", state_file="state.json")
+        client.base_url = f"{self.base}/servlet/PatenteServletController"
+        client.auth_check_url = f"{self.base}/jsp/patentes/PatenteSearchBasico.jsp"
+        client.login_url = f"{self.base}/servlet/LoginController"
+        with quiet():
+            client.load_existing_data("patents.csv", "state.json")
+        return client
+
+    def test_resumed_pending_hits_are_not_queued_twice(self):
+        # First run finds every hit and stops before fetching the details
+        client = self.scraper()
+        with quiet():
+            client.search("petroleo brasileiro", "NomeDepositante", continue_from_last=False)
+        self.assertEqual(len(client.patents), 15)
+
+        # The rerun imports the pending hits from the saved state, then crawls incrementally
+        client = self.scraper()
+        self.assertEqual(len(client.patents), 15)
+        with quiet():
+            patents = client.search("petroleo brasileiro", "NomeDepositante", stop_after_known_pages=1)
+
+        ids = [patent.patent_id for patent in client.patents]
+        self.assertEqual(len(ids), 15)
+        self.assertEqual(len(set(ids)), 15)
+        self.assertEqual(len(patents), 15)
+
+    def test_parallel_search_skips_resumed_pending_hits(self):
+        # First run stops after the first page, before fetching the details
+        client = self.scraper()
+        with quiet():
+            client.search("petroleo brasileiro", "NomeDepositante", max_pages=1, continue_from_last=False)
+        self.assertEqual(len(client.patents), 5)
+
+        # The rerun imports the pending hits, then retrieves every page again in parallel
+        client = self.scraper()
+        self.assertEqual(len(client.patents), 5)
+        with quiet():
+            patents = client.search_parallel("petroleo brasileiro", "NomeDepositante", sessions=2,
+                                             continue_from_last=False)
+
+        ids = [patent.patent_id for patent in client.patents]
+        self.assertEqual(len(ids), 15)
+        self.assertEqual(len(set(ids)), 15)
+        self.assertEqual(len(patents), 15)
+
+
+if __name__ == '__main__':
+    unittest.main()